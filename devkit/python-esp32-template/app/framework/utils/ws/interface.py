@@ -13,7 +13,13 @@ class WebsocketInterface(SingletonBase):
 
     ws = None
 
-    def __init__(self):
+    # At most this many frames wait for the next batch: the oldest are
+    # dropped beyond it, so a long disconnection cannot exhaust the RAM
+    BATCH_MAX = 32
+
+    def _init_once(self):
+        # Frames waiting to be sent as one batch (see queue_value)
+        self.batch = []
         App().setup.append(self.connect)
         App().update.append(self.update)
         self.RECONNECT = App().config.websocket.reconnect
@@ -31,8 +37,8 @@ class WebsocketInterface(SingletonBase):
         print("Auth frame sent")
 
 
-    def send_value(self, action: str, value: any=None):
-        frame = Frame(
+    def build_frame(self, action: str, value: any=None):
+        return Frame(
             metadata={
                 "senderId": App().config.device_id,
                 "timestamp": int(time.time()),
@@ -40,11 +46,36 @@ class WebsocketInterface(SingletonBase):
             action=action,
             value=value,
         )
-        self.send_frame(frame)
+
+    def send_value(self, action: str, value: any=None):
+        self.send_frame(self.build_frame(action, value))
 
     def send_frame(self, frame):
         self.ws.send(frame.to_json())
 
+    def queue_value(self, action: str, value: any=None):
+        """
+        Buffer a frame instead of sending it right away. Buffered frames are
+        sent together as one batch message (a JSON array of frames) on the
+        next update. Use it for high-rate sensor readings. Beyond BATCH_MAX
+        pending frames the oldest one is dropped.
+        """
+        if len(self.batch) >= self.BATCH_MAX:
+            self.batch.pop(0)
+        self.batch.append(self.build_frame(action, value))
+
+    def send_batch(self, frames):
+        if not frames:
+            return
+        self.ws.send("[" + ",".join(frame.to_json() for frame in frames) + "]")
+
+    def flush(self):
+        if not self.batch:
+            return
+        frames = self.batch
+        self.batch = []
+        self.send_batch(frames)
+
     def update(self):
         """
         Non-blocking ws loop.
@@ -55,10 +86,15 @@ class WebsocketInterface(SingletonBase):
         # The self.ws only exist when we establish connection. Otherwise it's None
         if self.ws:
             self.CONNECTED = self.ws.check_connection()
+        if not self.CONNECTED and self.batch:
+            # Stale readings are not sent after a reconnection
+            self.batch = []
         if self.CLOSED:
             return
         if self.CONNECTED:
             try:
+                # Send the frames buffered since the last update in one message
+                self.flush()
                 # Check for incoming messages (non-blocking)
                 data = self.ws.recv()
                 if data:  # Only process if data is available
@@ -104,6 +140,7 @@ class WebsocketInterface(SingletonBase):
     def close(self, shutdown=True):
         self.CONNECTED = False
         self.CLOSED = shutdown
+        self.batch = []
         try:
             self.ws.close()
         except Exception as e:
@@ -0,0 +1,98 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Deque, Optional
+
+from app.config import AdmissionConfig
+from app.log import get_logger
+from app.metrics import ADMISSIONS
+
+log = get_logger("ws")
+
+
+class AdmissionControl:
+    """
+    Token bucket on WebSocket upgrades: `rate_per_s` accepts per second,
+    up to `burst` at once. Requests beyond it wait in a FIFO queue (at most
+    `max_pending`, each at most `max_wait_s`); the others are refused with
+    503 and a jittered Retry-After, so a reconnect storm after a restart is
+    spread instead of accepted all at once.
+    """
+
+    def __init__(self, cfg: Optional[AdmissionConfig] = None) -> None:
+        self.cfg = cfg or AdmissionConfig()
+        self._tokens = float(max(1, self.cfg.burst))
+        self._updated = time.monotonic()
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._release_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.cfg.rate_per_s > 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """
+        Seconds a refused client should wait, randomized so the retries
+        do not come back together.
+        """
+        return random.randint(1, max(1, int(self.cfg.retry_after_s)))
+
+    async def acquire(self) -> bool:
+        """
+        Waits for an accept token. Returns False when the request must be
+        refused (queue full, or no token within `max_wait_s`).
+        """
+        if not self.enabled:
+            return True
+
+        self._refill()
+        if self._tokens >= 1 and not self._waiters:
+            self._tokens -= 1
+            ADMISSIONS.inc("accepted")
+            return True
+
+        if len(self._waiters) >= self.cfg.max_pending:
+            ADMISSIONS.inc("rejected")
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._schedule_release()
+        try:
+            await asyncio.wait_for(waiter, self.cfg.max_wait_s)
+        except asyncio.TimeoutError:
+            ADMISSIONS.inc("timeout")
+            return False
+        ADMISSIONS.inc("queued")
+        return True
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(float(max(1, self.cfg.burst)), self._tokens + (now - self._updated) * self.cfg.rate_per_s)
+        self._updated = now
+
+    def _schedule_release(self) -> None:
+        if self._release_handle is None:
+            delay = max(0.0, (1 - self._tokens) / self.cfg.rate_per_s)
+            self._release_handle = asyncio.get_running_loop().call_later(delay, self._release)
+
+    def _release(self) -> None:
+        self._release_handle = None
+        self._refill()
+        waiters = self._waiters
+        while waiters and self._tokens >= 1:
+            waiter = waiters.popleft()
+            # Timed out or disconnected meanwhile
+            if waiter.done():
+                continue
+            waiter.set_result(None)
+            self._tokens -= 1
+        while waiters and waiters[0].done():
+            waiters.popleft()
+        if waiters:
+            self._schedule_release()
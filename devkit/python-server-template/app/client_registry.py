@@ -0,0 +1,48 @@
+from typing import Dict, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class ClientRegistry(Generic[T]):
+    """
+    Registered client ids and their connections, indexed both ways.
+
+    Ids stay known after a disconnect (mapped to None) so they can still be
+    listed as disconnected clients.
+    """
+
+    def __init__(self) -> None:
+        self._by_id: Dict[str, Optional[T]] = {}
+        self._by_conn: Dict[T, str] = {}
+
+    def set(self, client_id: str, conn: T) -> None:
+        # A connection registering again under a new id releases the old one
+        previous_id = self._by_conn.get(conn)
+        if previous_id is not None and previous_id != client_id:
+            self._by_id[previous_id] = None
+
+        # An id reconnecting from a new socket replaces the stale one
+        previous_conn = self._by_id.get(client_id)
+        if previous_conn is not None and previous_conn is not conn:
+            self._by_conn.pop(previous_conn, None)
+
+        self._by_id[client_id] = conn
+        self._by_conn[conn] = client_id
+
+    def unset(self, conn: T) -> Optional[str]:
+        client_id = self._by_conn.pop(conn, None)
+        if client_id is not None:
+            self._by_id[client_id] = None
+        return client_id
+
+    def get(self, client_id: str) -> Optional[T]:
+        return self._by_id.get(client_id)
+
+    def id_of(self, conn: T) -> Optional[str]:
+        return self._by_conn.get(conn)
+
+    def status(self) -> Dict[str, bool]:
+        """
+        Every known client id -> whether it is currently connected.
+        """
+        return {client_id: conn is not None for client_id, conn in self._by_id.items()}
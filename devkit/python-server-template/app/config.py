@@ -1,6 +1,6 @@
 import json
-from dataclasses import dataclass
-from typing import Dict, List
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
 
 
 @dataclass
@@ -11,6 +11,128 @@ class ServerConfig:
     ws_path: str
 
 
+@dataclass
+class HubConfig:
+    send_queue_size: int = 256
+    slow_consumer_policy: str = "drop_oldest"
+    default_subscriptions: List[str] = field(default_factory=lambda: ["*"])
+    batch_window_ms: float = 5.0
+    batch_max_frames: int = 64
+    # "immediate": 00-new-client / 00-lost-client per change
+    # "batched": one 00-presence delta per presence_interval_ms
+    presence_mode: str = "immediate"
+    presence_interval_ms: float = 250.0
+
+
+@dataclass
+class AdmissionConfig:
+    # WebSocket upgrades accepted per second (0: no limit), and at once
+    rate_per_s: float = 0.0
+    burst: int = 20
+    # Upgrades waiting for a token, and for how long at most
+    max_pending: int = 1000
+    max_wait_s: float = 10.0
+    # Refused clients get a random Retry-After between 1 and this
+    retry_after_s: float = 5.0
+
+
+@dataclass
+class RetainedConfig:
+    # Action patterns whose last frame is kept, and those kept per sender
+    actions: List[str] = field(default_factory=list)
+    per_sender: List[str] = field(default_factory=list)
+    max_entries: int = 10000
+    # "register": replayed on 00-new-connection, "connect": on connection
+    replay_on: str = "register"
+
+
+@dataclass
+class ResumeConfig:
+    # Routed frames get a "seq"; registered clients keep their last
+    # ring_size frames, for ttl_s after a disconnect
+    enabled: bool = False
+    ring_size: int = 256
+    ttl_s: float = 120.0
+
+
+@dataclass
+class JournalConfig:
+    # Directory of the segment files (one subdirectory per worker)
+    enabled: bool = False
+    path: str = "journal"
+    segment_size_mb: float = 16.0
+    # Retention: oldest segments deleted beyond these (0: no age limit)
+    max_segments: int = 64
+    max_age_s: float = 0.0
+    flush_interval_ms: float = 100.0
+    # Records waiting for the writer; beyond it they are dropped
+    max_pending: int = 100000
+    fsync: bool = False
+
+
+@dataclass
+class LoggingConfig:
+    level: str = "INFO"
+    categories: Dict[str, str] = field(default_factory=dict)
+    frame_sampling: Dict[str, int] = field(default_factory=dict)
+    queue_size: int = 10000
+
+
+@dataclass
+class FederationConfig:
+    enabled: bool = False
+    path: str = "/federation"
+    peers: List[str] = field(default_factory=list)
+    token: str = ""
+    max_hops: int = 4
+    queue_size: int = 1024
+    seen_size: int = 10000
+    interest_delay_ms: float = 50.0
+    # Action patterns whose frames from linked servers also go through the
+    # local rules and WS handlers (by default only their origin handles them)
+    dispatch_actions: List[str] = field(default_factory=list)
+
+
+@dataclass
+class LatencyConfig:
+    # "synced": sender clocks are trusted (NTP), latency = arrival - timestamp
+    # "relative": per-sender clock offset is estimated and removed
+    clock: str = "synced"
+    tolerance_ms: float = 50.0
+    max_latency_s: float = 60.0
+    skew_window_s: float = 300.0
+
+
+@dataclass
+class DispatchConfig:
+    # "connection": frames of one connection are handled in order
+    # "action": frames of one action are handled in order
+    # "concurrent": no ordering
+    ordering: str = "connection"
+    max_concurrency: int = 64
+    max_pending: int = 10000
+    # 0: no timeout
+    handler_timeout_s: float = 30.0
+    cancel_on_disconnect: bool = True
+
+
+@dataclass
+class SchedulerConfig:
+    # JSON file keeping the pending delayed actions across restarts ("": not kept)
+    persist_path: str = ""
+    save_interval_s: float = 1.0
+
+
+@dataclass
+class RuleConfig:
+    name: str
+    # Condition tree and outputs, compiled by app/rules.py
+    when: Dict[str, Any]
+    then: List[Dict[str, Any]]
+    once: bool = False
+    reset_on: List[str] = field(default_factory=list)
+
+
 @dataclass
 class RouteConfig:
     method: str
@@ -23,13 +145,27 @@ class RouteConfig:
 class WsActionConfig:
     controller: str
     action: str
+    # Optional value schema, see app/schemas.py
+    schema: Optional[Any] = None
 
 
 @dataclass
 class AppConfig:
     server: ServerConfig
     routes: List[RouteConfig]
-    ws_actions: Dict[str, WsActionConfig]
+    # action or pattern (`01-*`, `*`) -> its handlers, in call order
+    ws_actions: Dict[str, List[WsActionConfig]]
+    hub: HubConfig = field(default_factory=HubConfig)
+    retained: RetainedConfig = field(default_factory=RetainedConfig)
+    admission: AdmissionConfig = field(default_factory=AdmissionConfig)
+    resume: ResumeConfig = field(default_factory=ResumeConfig)
+    journal: JournalConfig = field(default_factory=JournalConfig)
+    logging: LoggingConfig = field(default_factory=LoggingConfig)
+    federation: FederationConfig = field(default_factory=FederationConfig)
+    latency: LatencyConfig = field(default_factory=LatencyConfig)
+    dispatch: DispatchConfig = field(default_factory=DispatchConfig)
+    scheduler: SchedulerConfig = field(default_factory=SchedulerConfig)
+    rules: List[RuleConfig] = field(default_factory=list)
 
 
 def load_config(path: str) -> AppConfig:
@@ -39,6 +175,17 @@ def load_config(path: str) -> AppConfig:
     s = raw.get("server", {})
     routes_raw = raw.get("routes", [])
     ws_actions_raw = raw.get("ws_actions", {})
+    h = raw.get("hub", {})
+    rt = raw.get("retained", {})
+    ad = raw.get("admission", {})
+    rs = raw.get("resume", {})
+    jn = raw.get("journal", {})
+    lg = raw.get("logging", {})
+    fd = raw.get("federation", {})
+    lt = raw.get("latency", {})
+    dp = raw.get("dispatch", {})
+    sc = raw.get("scheduler", {})
+    rules_raw = raw.get("rules", [])
 
     return AppConfig(
         server=ServerConfig(
@@ -57,10 +204,96 @@ def load_config(path: str) -> AppConfig:
             for r in routes_raw
         ],
         ws_actions={
-            action_name: WsActionConfig(
-                controller=cfg["controller"],
-                action=cfg["action"]
+            action_name: [
+                WsActionConfig(
+                    controller=cfg["controller"],
+                    action=cfg["action"],
+                    schema=cfg.get("schema"),
+                )
+                # One handler (object) or several (list)
+                for cfg in (cfgs if isinstance(cfgs, list) else [cfgs])
+            ]
+            for action_name, cfgs in ws_actions_raw.items()
+        },
+        hub=HubConfig(
+            send_queue_size=int(h.get("send_queue_size", 256)),
+            slow_consumer_policy=h.get("slow_consumer_policy", "drop_oldest"),
+            default_subscriptions=list(h.get("default_subscriptions", ["*"])),
+            batch_window_ms=float(h.get("batch_window_ms", 5.0)),
+            batch_max_frames=int(h.get("batch_max_frames", 64)),
+            presence_mode=h.get("presence_mode", "immediate"),
+            presence_interval_ms=float(h.get("presence_interval_ms", 250.0)),
+        ),
+        admission=AdmissionConfig(
+            rate_per_s=float(ad.get("rate_per_s", 0.0)),
+            burst=int(ad.get("burst", 20)),
+            max_pending=int(ad.get("max_pending", 1000)),
+            max_wait_s=float(ad.get("max_wait_s", 10.0)),
+            retry_after_s=float(ad.get("retry_after_s", 5.0)),
+        ),
+        retained=RetainedConfig(
+            actions=list(rt.get("actions", [])),
+            per_sender=list(rt.get("per_sender", [])),
+            max_entries=int(rt.get("max_entries", 10000)),
+            replay_on=rt.get("replay_on", "register"),
+        ),
+        resume=ResumeConfig(
+            enabled=bool(rs.get("enabled", False)),
+            ring_size=int(rs.get("ring_size", 256)),
+            ttl_s=float(rs.get("ttl_s", 120.0)),
+        ),
+        journal=JournalConfig(
+            enabled=bool(jn.get("enabled", False)),
+            path=jn.get("path", "journal"),
+            segment_size_mb=float(jn.get("segment_size_mb", 16.0)),
+            max_segments=int(jn.get("max_segments", 64)),
+            max_age_s=float(jn.get("max_age_s", 0.0)),
+            flush_interval_ms=float(jn.get("flush_interval_ms", 100.0)),
+            max_pending=int(jn.get("max_pending", 100000)),
+            fsync=bool(jn.get("fsync", False)),
+        ),
+        logging=LoggingConfig(
+            level=lg.get("level", "INFO"),
+            categories=dict(lg.get("categories", {})),
+            frame_sampling=dict(lg.get("frame_sampling", {})),
+            queue_size=int(lg.get("queue_size", 10000)),
+        ),
+        federation=FederationConfig(
+            enabled=bool(fd.get("enabled", False)),
+            path=fd.get("path", "/federation"),
+            peers=list(fd.get("peers", [])),
+            token=fd.get("token", ""),
+            max_hops=int(fd.get("max_hops", 4)),
+            queue_size=int(fd.get("queue_size", 1024)),
+            seen_size=int(fd.get("seen_size", 10000)),
+            interest_delay_ms=float(fd.get("interest_delay_ms", 50.0)),
+            dispatch_actions=list(fd.get("dispatch_actions", [])),
+        ),
+        latency=LatencyConfig(
+            clock=lt.get("clock", "synced"),
+            tolerance_ms=float(lt.get("tolerance_ms", 50.0)),
+            max_latency_s=float(lt.get("max_latency_s", 60.0)),
+            skew_window_s=float(lt.get("skew_window_s", 300.0)),
+        ),
+        dispatch=DispatchConfig(
+            ordering=dp.get("ordering", "connection"),
+            max_concurrency=int(dp.get("max_concurrency", 64)),
+            max_pending=int(dp.get("max_pending", 10000)),
+            handler_timeout_s=float(dp.get("handler_timeout_s", 30.0)),
+            cancel_on_disconnect=bool(dp.get("cancel_on_disconnect", True)),
+        ),
+        scheduler=SchedulerConfig(
+            persist_path=sc.get("persist_path", ""),
+            save_interval_s=float(sc.get("save_interval_s", 1.0)),
+        ),
+        rules=[
+            RuleConfig(
+                name=r.get("name", ""),
+                when=r["when"],
+                then=list(r.get("then", [])),
+                once=bool(r.get("once", False)),
+                reset_on=[r["reset_on"]] if isinstance(r.get("reset_on"), str) else list(r.get("reset_on", [])),
             )
-            for action_name, cfg in ws_actions_raw.items()
-        }
+            for r in rules_raw
+        ],
     )
\ No newline at end of file
@@ -1,16 +1,24 @@
+import logging
 from aiohttp import web
+from app.log import get_logger
 from app.ws_hub import WsHub
+from app.scheduler import Scheduler
 from app.frames.factory import frame
 from typing import Any, Dict
 
 class Controller:
     def __init__(self, app: web.Application):
         self.app = app
+        self.log: logging.Logger = get_logger(f"controllers.{type(self).__module__.rsplit('.', 1)[-1]}")
 
     @property
     def hub(self) -> WsHub:
         return self.app["hub"]
     
+    @property
+    def scheduler(self) -> Scheduler:
+        return self.app["scheduler"]
+
     @property
     def server_id(self) -> str:
         return self.app["server_id"]
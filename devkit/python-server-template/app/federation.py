@@ -0,0 +1,355 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Set
+
+import aiohttp
+from aiohttp import web, WSMsgType, WSCloseCode
+
+from app.config import FederationConfig
+from app.frames.parser import FrameParser
+from app.log import get_logger
+from app import metrics
+from app.subscriptions import pattern_matches, validate_pattern
+
+if TYPE_CHECKING:
+    from app.ws_hub import WsHub
+
+log = get_logger("federation")
+
+# Actions bound to the connection that sent them (replies, registration,
+# subscriptions): their handlers never run for frames of a linked server,
+# even when listed in dispatch_actions
+CONNECTION_ACTIONS = ("ping", "00-*")
+
+
+def _connection_bound(pattern: str) -> bool:
+    return any(pattern_matches(p, pattern) for p in CONNECTION_ACTIONS)
+
+
+class FederationLink:
+    """
+    One persistent WebSocket link to another server.
+
+    Like WsConnection, outgoing envelopes go through a bounded queue
+    (oldest dropped when full) drained by a writer task, so a slow or
+    distant room never delays the local hub.
+    """
+
+    def __init__(self, url: Optional[str], queue_size: int) -> None:
+        self.url = url  # None for links opened by the peer
+        self.node: Optional[str] = None
+        self.interest: Set[str] = set()
+        # Last interest sent to the peer: unchanged interest is not re-sent,
+        # so two nodes do not echo interest updates to each other forever
+        self.advertised: Optional[Set[str]] = None
+        self.dropped = 0
+        self.ws: Any = None
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    @property
+    def connected(self) -> bool:
+        return self.ws is not None and not self.ws.closed
+
+    def wants(self, action: Optional[str]) -> bool:
+        if action is None:
+            return True
+        return any(pattern_matches(pattern, action) for pattern in self.interest)
+
+    def send(self, envelope: str) -> None:
+        try:
+            self._queue.put_nowait(envelope)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            self._queue.get_nowait()
+            self._queue.put_nowait(envelope)
+
+    async def write_loop(self) -> None:
+        while True:
+            envelope = await self._queue.get()
+            await self.ws.send_str(envelope)
+
+
+class Federation:
+    """
+    Links hubs of several servers (rooms) over persistent WebSocket links.
+
+    - frames are forwarded to the links whose peer has subscribers for the
+      action (interest = patterns of its clients and of its own peers)
+    - loops are prevented by a message id (`<origin node>:<n>`) remembered
+      for a while, a hop limit, and never sending back on the arrival link
+    - client registrations are shared, so `send_to` reaches a device in
+      another room through the link it was announced on
+    - frames from links are handled by the rules and action handlers of
+      their origin server only, unless their action is listed in
+      `dispatch_actions`: those also go through the local ones (once,
+      thanks to the message ids) and are part of the advertised interest
+    """
+
+    def __init__(self, hub: "WsHub", node_id: str, cfg: FederationConfig) -> None:
+        self.hub = hub
+        self.node_id = node_id
+        self.cfg = cfg
+        self._links: List[FederationLink] = []
+        self._clients: Dict[str, FederationLink] = {}
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._counter = itertools.count()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tasks: List[asyncio.Task] = []
+        self._interest_task: Optional[asyncio.Task] = None
+        # Actions the local handlers and rules want from the other rooms
+        self._handled: Set[str] = set()
+        for pattern in cfg.dispatch_actions:
+            validate_pattern(pattern)
+            if _connection_bound(pattern):
+                log.warning("Connection-bound actions are never dispatched from a link: %s", pattern)
+            else:
+                self._handled.add(pattern)
+
+    # ---- lifecycle ----
+
+    async def start(self) -> None:
+        self._session = aiohttp.ClientSession()
+        for url in self.cfg.peers:
+            link = FederationLink(url, self.cfg.queue_size)
+            self._tasks.append(asyncio.create_task(self._run_outbound(link)))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self._interest_task is not None:
+            self._interest_task.cancel()
+        # Links opened by peers end with their handler once closed
+        for link in list(self._links):
+            if link.connected:
+                await link.ws.close(code=WSCloseCode.GOING_AWAY)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _run_outbound(self, link: FederationLink) -> None:
+        delay = 1.0
+        while True:
+            try:
+                async with self._session.ws_connect(
+                    link.url,
+                    params={"token": self.cfg.token} if self.cfg.token else None,
+                    heartbeat=30,
+                ) as ws:
+                    delay = 1.0
+                    log.info("Federation link up: %s", link.url)
+                    await self._serve_link(link, ws)
+            except (aiohttp.ClientError, OSError) as e:
+                log.warning("Federation link %s failed: %s", link.url, e)
+            await asyncio.sleep(delay)
+            delay = min(30.0, delay * 2)
+
+    async def handle_inbound(self, request: web.Request) -> web.WebSocketResponse:
+        """
+        aiohttp handler for links opened by other servers.
+        """
+        if self.cfg.token and request.query.get("token") != self.cfg.token:
+            raise web.HTTPForbidden(text="Invalid federation token")
+
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        await self._serve_link(FederationLink(None, self.cfg.queue_size), ws)
+        return ws
+
+    async def _serve_link(self, link: FederationLink, ws: Any) -> None:
+        link.ws = ws
+        link.send(self._envelope("hello", node=self.node_id))
+        self._send_interest(link)
+        for client_id, connected in (await self.hub.connected_clients()).items():
+            if self._clients.get(client_id) is not link:
+                link.send(self._envelope("client", id=self._new_id(), hops=0, cid=client_id, c=connected))
+
+        self._links.append(link)
+        writer = asyncio.create_task(link.write_loop())
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    await self._on_envelope(link, json.loads(msg.data))
+                except Exception as e:
+                    log.exception("Federation envelope error from %s: %s", link.node, e)
+        finally:
+            writer.cancel()
+            self._links.remove(link)
+            link.ws = None
+            for client_id in [cid for cid, owner in self._clients.items() if owner is link]:
+                del self._clients[client_id]
+                self.hub.set_federated_client(client_id, False)
+            log.info("Federation link down: %s", link.url or link.node)
+            self.interest_changed()
+
+    # ---- outgoing ----
+
+    def _envelope(self, kind: str, **fields: Any) -> str:
+        fields["t"] = kind
+        return json.dumps(fields, ensure_ascii=False)
+
+    def _new_id(self) -> str:
+        return f"{self.node_id}:{next(self._counter)}"
+
+    def _remember(self, msg_id: str) -> bool:
+        """
+        Returns False if the message was already seen.
+        """
+        if msg_id in self._seen:
+            return False
+        self._seen[msg_id] = None
+        if len(self._seen) > self.cfg.seen_size:
+            self._seen.popitem(last=False)
+        return True
+
+    def _forward(self, kind: str, msg_id: str, hops: int, exclude: Optional[FederationLink],
+                 action: Optional[str] = None, **fields: Any) -> None:
+        if hops >= self.cfg.max_hops:
+            return
+        envelope = None
+        for link in self._links:
+            if link is exclude or not link.connected or not link.wants(action):
+                continue
+            if envelope is None:
+                envelope = self._envelope(kind, id=msg_id, hops=hops + 1, a=action, **fields)
+            link.send(envelope)
+
+    def forward_frame(self, message: str, action: Optional[str]) -> None:
+        """
+        A frame routed by the local hub: hand it to the interested peers.
+        """
+        if not self._links:
+            return
+        msg_id = self._new_id()
+        self._remember(msg_id)
+        self._forward("frame", msg_id, 0, None, action, m=message)
+
+    def forward_send_to(self, client_ids: Iterable[str], message: str) -> int:
+        """
+        Sends to ids announced by peers. Returns how many were found.
+        """
+        return self._route_send_to(client_ids, message, 0)
+
+    def _route_send_to(self, client_ids: Iterable[str], message: str, hops: int) -> int:
+        if hops >= self.cfg.max_hops:
+            return 0
+        by_link: Dict[FederationLink, List[str]] = {}
+        for client_id in client_ids:
+            link = self._clients.get(client_id)
+            if link is not None and link.connected:
+                by_link.setdefault(link, []).append(client_id)
+        for link, ids in by_link.items():
+            link.send(self._envelope("send_to", ids=ids, hops=hops + 1, m=message))
+        return sum(len(ids) for ids in by_link.values())
+
+    def announce_client(self, client_id: str, connected: bool) -> None:
+        msg_id = self._new_id()
+        self._remember(msg_id)
+        self._forward("client", msg_id, 0, None, None, cid=client_id, c=connected)
+
+    def interest_changed(self) -> None:
+        """
+        Local subscriptions changed: re-advertise interest shortly (debounced).
+        """
+        if self._interest_task is None or self._interest_task.done():
+            self._interest_task = asyncio.create_task(self._advertise_interest())
+
+    async def _advertise_interest(self) -> None:
+        await asyncio.sleep(self.cfg.interest_delay_ms / 1000)
+        for link in self._links:
+            if link.connected:
+                self._send_interest(link)
+
+    def _send_interest(self, link: FederationLink) -> None:
+        interest = self._interest_for(link)
+        if interest != link.advertised:
+            link.advertised = interest
+            link.send(self._envelope("interest", patterns=sorted(interest)))
+
+    def _interest_for(self, link: FederationLink) -> Set[str]:
+        interest = self.hub.subscribed_patterns() | self._handled
+        for other in self._links:
+            if other is not link:
+                interest |= other.interest
+        return interest
+
+    # ---- incoming ----
+
+    async def _on_envelope(self, link: FederationLink, env: Dict[str, Any]) -> None:
+        kind = env.get("t")
+
+        if kind == "hello":
+            link.node = env.get("node")
+            if link.node == self.node_id:
+                log.warning("Federation link to self closed: %s", link.url)
+                await link.ws.close(code=WSCloseCode.POLICY_VIOLATION)
+            return
+
+        if kind == "interest":
+            link.interest = set(env.get("patterns", []))
+            self.interest_changed()
+            return
+
+        if kind == "send_to":
+            _, missing = self.hub.deliver_federated_send_to(env["ids"], env["m"])
+            if missing:
+                self._route_send_to(missing, env["m"], int(env.get("hops", 0)))
+            return
+
+        msg_id = env.get("id")
+        if not msg_id or not self._remember(msg_id):
+            return
+        hops = int(env.get("hops", 0))
+
+        if kind == "frame":
+            self._deliver_frame(env["m"], env.get("a"))
+            self._forward("frame", msg_id, hops, link, env.get("a"), m=env["m"])
+        elif kind == "client":
+            client_id = env["cid"]
+            connected = bool(env["c"])
+            if connected:
+                self._clients[client_id] = link
+            elif self._clients.get(client_id) is link:
+                del self._clients[client_id]
+            self.hub.set_federated_client(client_id, connected)
+            self._forward("client", msg_id, hops, link, None, cid=client_id, c=connected)
+
+    def _deliver_frame(self, message: str, action: Optional[str]) -> None:
+        """
+        A frame from a linked server, seen for the first time: routed to the
+        local subscribers. Frames of `dispatch_actions` are first validated
+        and fed to the rules and the action handlers (without a connection),
+        as ws_handler does for the frames of local clients.
+        """
+        if action is None or not any(pattern_matches(p, action) for p in self._handled):
+            self.hub.deliver_federated_frame(message, action)
+            return
+
+        app = self.hub.app
+        try:
+            frame = FrameParser(message).parse()
+        except Exception as e:
+            log.warning("Invalid federated frame ignored: %s", e)
+            metrics.FRAMES_INVALID.inc()
+            return
+
+        error = app["ws_dispatcher"].validate(frame)
+        if error:
+            log.warning("Federated frame rejected from %s (%s): %s", frame.sender_id, frame.action, error)
+            metrics.FRAMES_REJECTED.inc(frame.action)
+            return
+
+        received_at = time.time()
+        app["rules"].on_frame(frame, received_at)
+        app["ws_runner"].submit(frame, None, received_at)
+        self.hub.deliver_federated_frame(message, action)
@@ -1 +1 @@
-__all__ = ["frame", "parser", "factory"]
\ No newline at end of file
+__all__ = ["frame", "parser", "factory", "wire", "codecs", "jsonlib"]
\ No newline at end of file
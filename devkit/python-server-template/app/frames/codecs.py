@@ -0,0 +1,54 @@
+import json
+from typing import Any, Callable, Dict, Union
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # optional dependency
+    cbor2 = None
+
+
+class Codec:
+    """
+    Wire encoding of frames for one connection.
+
+    Text codecs travel in WebSocket TEXT messages, binary ones in BINARY
+    messages.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        binary: bool,
+        loads: Callable[[Union[str, bytes]], Any],
+        dumps: Callable[[Any], Union[str, bytes]],
+    ) -> None:
+        self.name = name
+        self.binary = binary
+        self.loads = loads
+        self.dumps = dumps
+
+    def __repr__(self) -> str:
+        return f"Codec({self.name})"
+
+
+JSON = Codec("json", False, json.loads, lambda obj: json.dumps(obj, ensure_ascii=False))
+
+CODECS: Dict[str, Codec] = {"json": JSON}
+
+if msgpack is not None:
+    CODECS["msgpack"] = Codec("msgpack", True, msgpack.unpackb, msgpack.packb)
+
+if cbor2 is not None:
+    CODECS["cbor"] = Codec("cbor", True, cbor2.loads, cbor2.dumps)
+
+
+def get_codec(name: str) -> Codec:
+    codec = CODECS.get(name.lower())
+    if codec is None:
+        raise ValueError(f"Unsupported codec '{name}' (available: {', '.join(CODECS)})")
+    return codec
@@ -1,13 +1,54 @@
-from dataclasses import dataclass
-from typing import Any, Dict, Optional
+import json
+from typing import Any, Dict, List, Optional
+
+from app.frames import jsonlib
 
 
-@dataclass
 class Frame:
-    metadata: Dict[str, Any]
-    action: str
-    value: Optional[Any]
-    raw_json: str
+    """
+    One validated frame.
+
+    `raw_json` is the frame text as received (routed as-is, never
+    re-serialized). `value` may be kept as JSON text by the decoder and is
+    then only decoded when a handler reads it.
+    """
+
+    __slots__ = ("metadata", "action", "_value", "_value_raw", "_raw_json", "_source")
+
+    def __init__(
+        self,
+        metadata: Dict[str, Any],
+        action: str,
+        value: Optional[Any] = None,
+        raw_json: Optional[str] = None,
+        value_raw: Optional[bytes] = None,
+        source: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.metadata = metadata
+        self.action = action
+        self._value = value
+        self._value_raw = value_raw
+        self._raw_json = raw_json
+        # Decoded object the JSON text is built from when there is no text
+        # (frames received with a binary codec)
+        self._source = source
+
+    @property
+    def value(self) -> Optional[Any]:
+        if self._value_raw is not None:
+            self._value = jsonlib.loads(self._value_raw)
+            self._value_raw = None
+        return self._value
+
+    @property
+    def raw_json(self) -> str:
+        if self._raw_json is None:
+            source = self._source
+            if source is None:
+                source = {"metadata": self.metadata, "action": self.action, "value": self.value}
+            self._raw_json = json.dumps(source, ensure_ascii=False)
+            self._source = None
+        return self._raw_json
 
     @property
     def sender_id(self) -> str:
@@ -15,4 +56,20 @@ class Frame:
 
     @property
     def timestamp(self) -> float:
-        return float(self.metadata.get("timestamp", 0))
\ No newline at end of file
+        return float(self.metadata.get("timestamp", 0))
+
+    @property
+    def receiver_ids(self) -> List[str]:
+        """
+        Optional `metadata.receiverId` (one id or a list of ids).
+        Empty when the frame is not addressed to specific clients.
+        """
+        receiver = self.metadata.get("receiverId")
+        if receiver is None:
+            return []
+        if isinstance(receiver, list):
+            return [str(r) for r in receiver]
+        return [str(receiver)]
+
+    def __repr__(self) -> str:
+        return f"Frame(action={self.action!r}, metadata={self.metadata!r}, value={self.value!r})"
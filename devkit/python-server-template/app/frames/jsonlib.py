@@ -0,0 +1,103 @@
+"""
+JSON decoding for the inbound frame pipeline.
+
+Uses msgspec or orjson when installed (fastest first), the standard
+library otherwise. Frames are decoded once and never re-serialized: the
+original text of each frame is kept for routing.
+"""
+
+import json
+import re
+from typing import Any, List, NamedTuple, Optional, Tuple, Union
+
+try:
+    import msgspec
+except ImportError:  # optional dependency
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+class FrameFields(NamedTuple):
+    metadata: Any
+    action: Any
+    value: Any
+    # JSON text of `value` when it is left undecoded (decoded on first access)
+    value_raw: Optional[bytes] = None
+
+
+if msgspec is not None:
+    BACKEND = "msgspec"
+    loads = msgspec.json.decode
+
+    class _Envelope(msgspec.Struct):
+        metadata: Any = None
+        action: Any = None
+        value: msgspec.Raw = msgspec.Raw(b"null")
+
+    _frame_decoder = msgspec.json.Decoder(_Envelope)
+    _batch_decoder = msgspec.json.Decoder(List[msgspec.Raw])
+elif orjson is not None:
+    BACKEND = "orjson"
+    loads = orjson.loads
+else:
+    BACKEND = "json"
+    loads = json.loads
+
+_raw_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"[ \t\n\r]*")
+
+
+def fields_of(obj: Any) -> FrameFields:
+    """
+    Fields of an already decoded frame object.
+    """
+    if not isinstance(obj, dict):
+        raise ValueError("Root must be a JSON object")
+    return FrameFields(obj.get("metadata"), obj.get("action"), obj.get("value"))
+
+
+def decode_frame(data: Union[str, bytes]) -> FrameFields:
+    if msgspec is None:
+        return fields_of(loads(data))
+    try:
+        envelope = _frame_decoder.decode(data)
+    except msgspec.ValidationError:
+        raise ValueError("Root must be a JSON object")
+    return FrameFields(envelope.metadata, envelope.action, None, bytes(envelope.value))
+
+
+def decode_batch(text: str) -> List[Tuple[FrameFields, str]]:
+    """
+    Frames of a batch envelope (JSON array), each with its own source text.
+    """
+    if msgspec is not None:
+        items = []
+        for raw in _batch_decoder.decode(text):
+            data = bytes(raw)
+            items.append((decode_frame(data), data.decode("utf-8")))
+        return items
+
+    # Standard library: raw_decode gives each element with its span in one pass
+    items = []
+    idx = _whitespace.match(text, 0).end()
+    if text[idx:idx + 1] != "[":
+        raise ValueError("Batch must be a JSON array")
+    idx = _whitespace.match(text, idx + 1).end()
+    if text[idx:idx + 1] == "]":
+        return items
+    while True:
+        obj, end = _raw_decoder.raw_decode(text, idx)
+        items.append((fields_of(obj), text[idx:end]))
+        idx = _whitespace.match(text, end).end()
+        char = text[idx:idx + 1]
+        if char == "]":
+            if text[idx + 1:].strip():
+                raise ValueError(f"Extra data after batch at char {idx + 1}")
+            return items
+        if char != ",":
+            raise ValueError(f"Expecting ',' delimiter at char {idx}")
+        idx = _whitespace.match(text, idx + 1).end()
@@ -1,25 +1,50 @@
-import json
 from aiohttp import web
+from typing import List, Union
+from app.frames import jsonlib
+from app.frames.codecs import JSON, Codec
 from app.frames.frame import Frame
 
 
 class FrameParser:
-    def __init__(self, raw_frame: str):
+    """
+    Parses one frame (an object) or a batch envelope (an array of frames
+    sent as a single message), encoded with `codec` (JSON by default).
+
+    JSON input is decoded once (see `jsonlib`) and each frame keeps its
+    original text as `raw_json`.
+    """
+
+    def __init__(self, raw_frame: Union[str, bytes], codec: Codec = JSON):
+        self.is_batch = False
         try:
-            self.frame = json.loads(raw_frame)
+            if codec.binary:
+                obj = codec.loads(raw_frame)
+                self.is_batch = isinstance(obj, list)
+                objs = obj if self.is_batch else [obj]
+                self._items = [(jsonlib.fields_of(o), None, o) for o in objs]
+            else:
+                text = raw_frame.decode("utf-8") if isinstance(raw_frame, bytes) else raw_frame
+                self.is_batch = text.lstrip()[:1] == "["
+                if self.is_batch:
+                    self._items = [(fields, raw, None) for fields, raw in jsonlib.decode_batch(text)]
+                else:
+                    self._items = [(jsonlib.decode_frame(text), text, None)]
         except Exception as e:
-            raise RuntimeError(f"FrameParser: Cannot load JSON. Reason: {e}")
-
-        self._validate()
+            raise RuntimeError(f"FrameParser: Cannot load {codec.name}. Reason: {e}")
 
-    def _validate(self) -> None:
-        if not isinstance(self.frame, dict):
-            raise RuntimeError("FrameParser: Root must be a JSON object")
+        if self.is_batch:
+            if not self._items:
+                raise RuntimeError("FrameParser: Batch must contain at least one frame")
+            for i, (fields, _, _) in enumerate(self._items):
+                self._validate(fields, f"batch[{i}]: ")
+        else:
+            self._validate(self._items[0][0])
 
+    def _validate(self, fields: jsonlib.FrameFields, where: str = "") -> None:
         errors = {}
 
         # metadata
-        md = self.frame.get("metadata")
+        md = fields.metadata
         if not isinstance(md, dict):
             errors["metadata"] = "Missing or invalid 'metadata' object"
         else:
@@ -27,9 +52,12 @@ class FrameParser:
                 errors["metadata.timestamp"] = "Missing 'timestamp'"
             if "senderId" not in md:
                 errors["metadata.senderId"] = "Missing 'senderId'"
+            receiver = md.get("receiverId")
+            if receiver is not None and not isinstance(receiver, (str, list)):
+                errors["metadata.receiverId"] = "Invalid 'receiverId' (must be a string or a list of strings)"
 
         # action
-        action = self.frame.get("action")
+        action = fields.action
         if not isinstance(action, str) or not action.strip():
             errors["action"] = "Missing or invalid 'action' (must be non-empty string)"
 
@@ -37,26 +65,35 @@ class FrameParser:
         # no strict validation here
 
         if errors:
-            raise RuntimeError(f"FrameParser: Validation errors: {errors}")
+            raise RuntimeError(f"FrameParser: {where}Validation errors: {errors}")
 
-    def parse(self) -> Frame:
+    @staticmethod
+    def _build(item: tuple) -> Frame:
+        fields, raw, source = item
         return Frame(
-            metadata=self.frame["metadata"],
-            action=self.frame["action"],
-            value=self.frame.get("value", None),
-            raw_json=json.dumps(self.frame, ensure_ascii=False),
+            metadata=fields.metadata,
+            action=fields.action,
+            value=fields.value,
+            raw_json=raw,
+            value_raw=fields.value_raw,
+            source=source,
         )
 
+    def parse(self) -> Frame:
+        if self.is_batch:
+            raise RuntimeError("FrameParser: Got a batch of frames, use parse_all()")
+        return self._build(self._items[0])
+
+    def parse_all(self) -> List[Frame]:
+        """
+        Frames of a batch in order, or a single-item list for a plain frame.
+        """
+        return [self._build(item) for item in self._items]
+
 
 async def parse_frame_from_request(request: web.Request) -> Frame:
     """
     Reads HTTP JSON body and validates it as the new Frame format.
+    The body text is kept as is: it is parsed once and never re-serialized.
     """
-    try:
-        body = await request.json()
-        raw = json.dumps(body, ensure_ascii=False)
-    except Exception:
-        raw = await request.text()
-
-    parser = FrameParser(raw)
-    return parser.parse()
\ No newline at end of file
+    return FrameParser(await request.read()).parse()
@@ -0,0 +1,71 @@
+import struct
+from typing import AsyncIterator, Union
+
+from aiohttp import StreamReader
+
+# Length-prefixed records: 4-byte big-endian unsigned length, then the frame
+_LENGTH = struct.Struct("!I")
+
+
+class RecordTooLarge(Exception):
+    pass
+
+
+async def iter_ndjson(stream: StreamReader, max_size: int) -> AsyncIterator[Union[bytes, RecordTooLarge]]:
+    """
+    Records of a newline-delimited body, read incrementally. Blank lines are
+    skipped. A line longer than `max_size` is skipped and reported as a
+    RecordTooLarge item, the stream then goes on with the next line.
+    """
+    buffer = bytearray()
+    skipping = False
+
+    async for chunk in stream.iter_any():
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            if skipping:
+                skipping = False
+            elif end - start > max_size:
+                yield RecordTooLarge(f"Record larger than {max_size} bytes")
+            else:
+                line = bytes(buffer[start:end]).strip()
+                if line:
+                    yield line
+            start = end + 1
+        del buffer[:start]
+
+        if len(buffer) > max_size:
+            if not skipping:
+                yield RecordTooLarge(f"Record larger than {max_size} bytes")
+                skipping = True
+            buffer.clear()
+
+    line = bytes(buffer).strip()
+    if line and not skipping:
+        yield line
+
+
+async def iter_length_prefixed(stream: StreamReader, max_size: int) -> AsyncIterator[Union[bytes, RecordTooLarge]]:
+    """
+    Records of a length-prefixed body (4-byte big-endian length + payload).
+    Oversized records are skipped and reported as RecordTooLarge items.
+    """
+    while True:
+        header = await stream.read(_LENGTH.size)
+        if not header:
+            return
+        if len(header) < _LENGTH.size:
+            header += await stream.readexactly(_LENGTH.size - len(header))
+        (length,) = _LENGTH.unpack(header)
+
+        if length > max_size:
+            yield RecordTooLarge(f"Record larger than {max_size} bytes")
+            while length:
+                length -= len(await stream.readexactly(min(length, 1 << 16)))
+            continue
+
+        yield await stream.readexactly(length)
@@ -0,0 +1,81 @@
+import struct
+from typing import Any, Dict, Optional
+
+from app.frames import jsonlib
+from app.frames.codecs import Codec
+
+# RFC 6455 section 5.2: FIN bit + opcode, server frames are never masked.
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+
+
+def encode_frame(payload: bytes, opcode: int = OP_TEXT) -> bytes:
+    """
+    Builds a complete unmasked WebSocket frame (header + payload).
+    """
+    first = 0x80 | opcode
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", first, length)
+    elif length < (1 << 16):
+        header = struct.pack("!BBH", first, 126, length)
+    else:
+        header = struct.pack("!BBQ", first, 127, length)
+    return header + payload
+
+
+def encode_text_frame(payload: bytes) -> bytes:
+    return encode_frame(payload, OP_TEXT)
+
+
+class WireMessage:
+    """
+    A message shared by every recipient of a broadcast.
+
+    The UTF-8 payload and the WebSocket frame are built once, on first use,
+    and the same bytes object is then written to every client transport.
+    Binary codecs are transcoded from the JSON text at most once each.
+    """
+
+    __slots__ = ("text", "_payload", "_frame", "_obj", "_encoded")
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self._payload: Optional[bytes] = None
+        self._frame: Optional[bytes] = None
+        self._obj: Any = None
+        self._encoded: Optional[Dict[str, tuple[bytes, bytes]]] = None
+
+    @property
+    def payload(self) -> bytes:
+        if self._payload is None:
+            self._payload = self.text.encode("utf-8")
+        return self._payload
+
+    @property
+    def frame(self) -> bytes:
+        if self._frame is None:
+            self._frame = encode_text_frame(self.payload)
+        return self._frame
+
+    def _encode(self, codec: Codec) -> tuple[bytes, bytes]:
+        if self._encoded is None:
+            self._encoded = {}
+        encoded = self._encoded.get(codec.name)
+        if encoded is None:
+            if self._obj is None:
+                self._obj = jsonlib.loads(self.text)
+            payload = codec.dumps(self._obj)
+            encoded = (payload, encode_frame(payload, OP_BINARY))
+            self._encoded[codec.name] = encoded
+        return encoded
+
+    def payload_for(self, codec: Codec) -> bytes:
+        if not codec.binary:
+            return self.payload
+        return self._encode(codec)[0]
+
+    def frame_for(self, codec: Codec) -> bytes:
+        if not codec.binary:
+            return self.frame
+        return self._encode(codec)[1]
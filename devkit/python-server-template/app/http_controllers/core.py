@@ -1,6 +1,13 @@
+import asyncio
+from typing import Any, Dict
 from aiohttp import web
 from app.http_controllers.base import HttpController
-from app.frames.parser import parse_frame_from_request
+from app.frames.parser import FrameParser, parse_frame_from_request
+from app.frames.stream import RecordTooLarge, iter_length_prefixed, iter_ndjson
+from app.metrics import REGISTRY
+
+INGEST_MAX_RECORD = 1 << 20
+INGEST_MAX_ERRORS = 20
 
 
 class CoreController(HttpController):
@@ -12,6 +19,65 @@ class CoreController(HttpController):
             "service": "unified-server"
         })
 
+    async def metrics(self, request: web.Request) -> web.Response:
+        """
+        Hub and dispatcher metrics in Prometheus text format.
+        """
+        self.hub.collect_metrics()
+        self.app["ws_runner"].collect_metrics()
+        self.scheduler.collect_metrics()
+        return web.Response(
+            text=REGISTRY.render(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    async def latency(self, request: web.Request) -> web.Response:
+        """
+        Sender -> hub and hub -> handler latency quantiles (p50 / p95 / p99)
+        per action and per sender.
+        """
+        return web.json_response(self.app["latency"].summary())
+
+    async def scheduled(self, request: web.Request) -> web.Response:
+        """
+        Pending delayed broadcasts, the next one first.
+        """
+        return web.json_response(self.scheduler.pending())
+
+    async def cancel_scheduled(self, request: web.Request) -> web.Response:
+        """
+        Cancels the delayed broadcast of the `key` path parameter.
+        """
+        if not self.scheduler.cancel(request.match_info["key"]):
+            return web.json_response(self.build_frame("error", "No pending action with this key"), status=404)
+        return web.json_response(self.build_frame("cancelled", request.match_info["key"]))
+
+    async def rules(self, request: web.Request) -> web.Response:
+        """
+        Interaction rules: whether each condition holds and how many times
+        it fired.
+        """
+        return web.json_response(self.app["rules"].state())
+
+    async def reset_rules(self, request: web.Request) -> web.Response:
+        """
+        Resets the rule of the optional `rule` query parameter, or all of
+        them, for the next show cycle.
+        """
+        try:
+            names = self.app["rules"].reset(request.query.get("rule"))
+        except KeyError:
+            return web.json_response(self.build_frame("error", "Unknown rule"), status=404)
+        return web.json_response(self.build_frame("rules_reset", names))
+
+    async def clear_retained(self, request: web.Request) -> web.Response:
+        """
+        Forgets the retained frames (those of the optional `action` query
+        parameter, a pattern, only), e.g. before the next show cycle.
+        """
+        dropped = self.hub.retained.clear(request.query.get("action"))
+        return web.json_response(self.build_frame("retained_cleared", dropped))
+
     async def broadcast(self, request: web.Request) -> web.Response:
         """
         Expects a Frame in HTTP body.
@@ -20,16 +86,95 @@ class CoreController(HttpController):
         try:
             frame = await parse_frame_from_request(request)
         except Exception as e:
-            return web.Response(
-                text=self.build_frame("UNKNOWN", "error", "string", str(e), 400),
-                status=400,
-                content_type="application/json"
-            )
-
-        sent = await self.hub.broadcast(frame.raw_json)
-        return web.json_response(self.build_frame(
-            receiver_id=frame.metadata.get("senderId", "UNKNOWN"),
-            slug="ws_sent",
-            datatype="int",
-            value=sent
-        ))
\ No newline at end of file
+            return web.json_response(self.build_frame("error", str(e)), status=400)
+
+        if frame.receiver_ids:
+            sent = await self.hub.send_to(frame.receiver_ids, frame.raw_json)
+        else:
+            sent = await self.hub.broadcast(frame.raw_json, action=frame.action)
+        return web.json_response(self.build_frame("ws_sent", sent))
+
+    async def ingest(self, request: web.Request) -> web.Response:
+        """
+        Streams many frames in one request, as NDJSON (one frame, or batch
+        array, per line) or length-prefixed records (4-byte big-endian length
+        + frame), read incrementally:
+
+          POST /api/ingest?format=ndjson|length&batch=100
+
+        Frames are validated as they arrive and routed like `broadcast`.
+        Every half client queue worth of frames, the body is not read
+        further until client queues have room again (backpressure up to the
+        sender through TCP). Returns a summary per `batch` records.
+        """
+        fmt = request.query.get("format")
+        if fmt is None:
+            fmt = "length" if request.content_type == "application/octet-stream" else "ndjson"
+        if fmt not in ("ndjson", "length"):
+            return web.json_response(self.build_frame("error", f"Unknown format '{fmt}' (ndjson, length)"), status=400)
+        try:
+            batch_size = max(1, int(request.query.get("batch", 100)))
+        except ValueError:
+            return web.json_response(self.build_frame("error", "Invalid batch size"), status=400)
+
+        records = iter_ndjson if fmt == "ndjson" else iter_length_prefixed
+        capacity = max(1, self.hub.cfg.send_queue_size // 2)
+        batches = []
+        batch = self._new_batch(0)
+        record = 0
+        routed = 0
+
+        try:
+            async for item in records(request.content, INGEST_MAX_RECORD):
+                record += 1
+                routed += await self._ingest_record(item, record, batch)
+                if routed >= capacity:
+                    routed = 0
+                    await self.hub.wait_for_capacity(capacity)
+                if batch["frames"] + batch["invalid"] >= batch_size:
+                    batches.append(batch)
+                    batch = self._new_batch(len(batches))
+        except asyncio.IncompleteReadError:
+            self._ingest_error(batch, record + 1, "Truncated record")
+
+        if batch["frames"] or batch["invalid"]:
+            batches.append(batch)
+
+        return web.json_response(self.build_frame("ingested", {
+            "records": record,
+            "frames": sum(b["frames"] for b in batches),
+            "sent": sum(b["sent"] for b in batches),
+            "invalid": sum(b["invalid"] for b in batches),
+            "batches": batches,
+        }))
+
+    @staticmethod
+    def _new_batch(index: int) -> Dict[str, Any]:
+        return {"batch": index, "frames": 0, "sent": 0, "invalid": 0, "errors": []}
+
+    @staticmethod
+    def _ingest_error(batch: Dict[str, Any], record: int, error: str) -> None:
+        batch["invalid"] += 1
+        if len(batch["errors"]) < INGEST_MAX_ERRORS:
+            batch["errors"].append({"record": record, "error": error})
+
+    async def _ingest_record(self, item: Any, record: int, batch: Dict[str, Any]) -> int:
+        """
+        Returns the number of frames routed.
+        """
+        if isinstance(item, RecordTooLarge):
+            self._ingest_error(batch, record, str(item))
+            return 0
+        try:
+            frames = FrameParser(item).parse_all()
+        except Exception as e:
+            self._ingest_error(batch, record, str(e))
+            return 0
+
+        for frame in frames:
+            batch["frames"] += 1
+            if frame.receiver_ids:
+                batch["sent"] += await self.hub.send_to(frame.receiver_ids, frame.raw_json)
+            else:
+                batch["sent"] += await self.hub.broadcast(frame.raw_json, action=frame.action)
+        return len(frames)
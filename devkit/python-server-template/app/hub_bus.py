@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.log import get_logger
+
+log = get_logger("bus")
+
+BusHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Frames can be large: allow long lines (the asyncio default limit is 64 KiB)
+MAX_LINE = 2 ** 24
+
+
+def socket_path(directory: str, worker_id: int) -> str:
+    return os.path.join(directory, f"worker-{worker_id}.sock")
+
+
+class _Peer:
+    """
+    Outgoing link to one other worker: a bounded queue drained by a task
+    that (re)connects to the peer Unix socket, like WsConnection does for
+    WebSocket clients. Oldest messages are dropped when the queue is full.
+    """
+
+    def __init__(self, path: str, queue_size: int) -> None:
+        self.path = path
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def send(self, line: bytes) -> None:
+        try:
+            self._queue.put_nowait(line)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            self._queue.get_nowait()
+            self._queue.put_nowait(line)
+
+    async def _run(self) -> None:
+        delay = 0.05
+        while True:
+            try:
+                _, writer = await asyncio.open_unix_connection(self.path)
+            except OSError:
+                # Peer not listening yet (still starting) or restarting
+                await asyncio.sleep(delay)
+                delay = min(1.0, delay * 2)
+                continue
+
+            delay = 0.05
+            log.debug("Connected to peer %s", self.path)
+            line = None
+            try:
+                while True:
+                    line = await self._queue.get()
+                    writer.write(line)
+                    await writer.drain()
+                    line = None
+            except (ConnectionError, OSError):
+                log.warning("Lost peer %s, reconnecting", self.path)
+                if line is not None:
+                    self.send(line)
+            finally:
+                writer.close()
+
+
+class HubBus:
+    """
+    Local bus between the workers of a multi-process server.
+
+    Every worker listens on a Unix socket in a shared directory and keeps
+    one outgoing link per other worker. Messages are JSON lines published
+    to every peer; each one carries the id of the worker that sent it.
+    """
+
+    def __init__(self, directory: str, worker_id: int, workers: int, queue_size: int = 10000) -> None:
+        self.directory = directory
+        self.worker_id = worker_id
+        self.workers = workers
+        self._handler: Optional[BusHandler] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._incoming: set[asyncio.StreamWriter] = set()
+        self._peers: List[_Peer] = [
+            _Peer(socket_path(directory, i), queue_size)
+            for i in range(workers)
+            if i != worker_id
+        ]
+
+    async def start(self, handler: BusHandler) -> None:
+        self._handler = handler
+        path = socket_path(self.directory, self.worker_id)
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = await asyncio.start_unix_server(self._serve, path, limit=MAX_LINE)
+        for peer in self._peers:
+            peer.start()
+
+    async def stop(self) -> None:
+        for peer in self._peers:
+            await peer.stop()
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._incoming):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        """
+        Non-blocking: the message is serialized once and queued for every peer.
+        """
+        if not self._peers:
+            return
+        message["w"] = self.worker_id
+        line = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+        if len(line) > MAX_LINE:
+            log.warning("Bus message of %d bytes dropped (%s), limit is %d", len(line), message.get("t"), MAX_LINE)
+            return
+        for peer in self._peers:
+            peer.send(line)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._incoming.add(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError as e:
+                    # Line beyond MAX_LINE: the stream cannot be resynchronized,
+                    # drop the connection (the peer reconnects)
+                    log.warning("Oversized bus message, peer connection reset: %s", e)
+                    return
+                if not line:
+                    return
+                try:
+                    message = json.loads(line)
+                except ValueError as e:
+                    log.warning("Invalid bus message ignored: %s", e)
+                    continue
+                try:
+                    await self._handler(message)
+                except Exception as e:
+                    log.exception("Bus handler error for %s: %s", message.get("t"), e)
+        except (ConnectionError, OSError):
+            pass
+        except asyncio.CancelledError:
+            # Loop shutdown: end quietly, the peer reconnects to the next worker
+            pass
+        finally:
+            self._incoming.discard(writer)
+            writer.close()
@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.config import JournalConfig
+from app.log import get_logger
+from app import metrics
+
+log = get_logger("hub")
+
+IN, OUT = 0, 1
+DIRECTIONS = {"in": IN, "out": OUT}
+
+_MAGIC = b"MJNL1\n"
+# Payload length, payload CRC32, wall clock time, direction
+_HEADER = struct.Struct("<IIdB")
+_SUFFIX = ".seg"
+
+
+class JournalRecord(NamedTuple):
+    at: float
+    direction: str
+    message: str
+
+
+class FrameJournal:
+    """
+    Append-only journal of the frames the hub receives and routes.
+
+    `record()` only appends to an in-memory buffer. A background task hands
+    the buffer to a single writer thread every `flush_interval_ms`, which
+    writes it as one group write: the event loop never touches the disk.
+    Segments are named after the time of their first record and rotated
+    before they exceed `segment_size_mb`. The oldest are deleted beyond
+    `max_segments` or when older than `max_age_s`. When the disk cannot
+    keep up, records beyond `max_pending` are dropped (and counted) rather
+    than delaying the hub.
+    """
+
+    def __init__(self, cfg: Optional[JournalConfig] = None, path: Optional[str] = None) -> None:
+        self.cfg = cfg or JournalConfig()
+        self.path = path if path is not None else self.cfg.path
+        self._buffer: List[Tuple[float, int, str]] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+        # Writer thread state
+        self._file: Optional[BinaryIO] = None
+        self._size = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.cfg.enabled
+
+    def record(self, direction: int, message: str) -> None:
+        """
+        Queues one frame (JSON text) for the journal. Never blocks.
+        """
+        buffer = self._buffer
+        if len(buffer) >= self.cfg.max_pending:
+            metrics.JOURNAL_DROPPED.inc()
+            return
+        buffer.append((time.time(), direction, message))
+
+    async def start(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal")
+        self._task = asyncio.create_task(self._run())
+        log.info("Frame journal in %s", self.path)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self._flush()
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+        self._executor.shutdown()
+        self._executor = None
+
+    async def _run(self) -> None:
+        interval = self.cfg.flush_interval_ms / 1000
+        while True:
+            await asyncio.sleep(interval)
+            await self._flush()
+
+    async def _flush(self) -> None:
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._write, batch)
+        except OSError as e:
+            metrics.JOURNAL_DROPPED.inc(amount=len(batch))
+            log.error("Cannot write the frame journal: %s", e)
+        else:
+            metrics.JOURNAL_RECORDS.inc(amount=len(batch))
+
+    # Writer thread
+
+    def _write(self, batch: List[Tuple[float, int, str]]) -> None:
+        limit = int(self.cfg.segment_size_mb * 1024 * 1024)
+        chunk = bytearray()
+        for at, direction, message in batch:
+            payload = message.encode("utf-8")
+            size = _HEADER.size + len(payload)
+            written = self._size + len(chunk)
+            if self._file is None or (written + size > limit and written > len(_MAGIC)):
+                self._write_chunk(chunk)
+                chunk = bytearray()
+                self._rotate(at)
+            chunk += _HEADER.pack(len(payload), zlib.crc32(payload), at, direction)
+            chunk += payload
+        self._write_chunk(chunk)
+        self._file.flush()
+        if self.cfg.fsync:
+            os.fsync(self._file.fileno())
+
+    def _write_chunk(self, chunk: bytearray) -> None:
+        if chunk:
+            self._file.write(chunk)
+            self._size += len(chunk)
+
+    def _rotate(self, at: float) -> None:
+        self._close()
+        name = os.path.join(self.path, f"{int(at * 1_000_000):017d}{_SUFFIX}")
+        self._file = open(name, "ab")
+        self._file.write(_MAGIC)
+        self._size = len(_MAGIC)
+        self._enforce_retention(at)
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _enforce_retention(self, now: float) -> None:
+        segments = list_segments(self.path)
+        # The current segment is the last one and never deleted
+        expired = len(segments) - max(1, self.cfg.max_segments)
+        for i, (started, name) in enumerate(segments[:-1]):
+            # A segment ends where the next one starts
+            too_old = self.cfg.max_age_s and segments[i + 1][0] < now - self.cfg.max_age_s
+            if i >= expired and not too_old:
+                break
+            try:
+                os.remove(name)
+            except OSError as e:
+                log.warning("Cannot delete journal segment %s: %s", name, e)
+
+
+def list_segments(path: str) -> List[Tuple[float, str]]:
+    """
+    Segment files of a journal directory: (start time, path), oldest first.
+    """
+    try:
+        names = os.listdir(path)
+    except FileNotFoundError:
+        return []
+    segments = []
+    for name in names:
+        if name.endswith(_SUFFIX) and name[: -len(_SUFFIX)].isdigit():
+            segments.append((int(name[: -len(_SUFFIX)]) / 1_000_000, os.path.join(path, name)))
+    segments.sort()
+    return segments
+
+
+def read_journal(
+    path: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    direction: Optional[str] = None,
+) -> Iterator[JournalRecord]:
+    """
+    Frames recorded between `start` and `end` (wall clock times, inclusive),
+    oldest first, optionally only "in" or "out" ones. Segments outside the
+    range are not read, the others are memory-mapped. A truncated or
+    corrupted record (crash while writing) ends its segment.
+    """
+    wanted = DIRECTIONS[direction] if direction is not None else None
+    segments = list_segments(path)
+    for i, (started, name) in enumerate(segments):
+        if end is not None and started > end:
+            break
+        if start is not None and i + 1 < len(segments) and segments[i + 1][0] < start:
+            continue
+        with open(name, "rb") as f:
+            if os.fstat(f.fileno()).st_size < len(_MAGIC):
+                continue
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield from _read_segment(name, data, start, end, wanted)
+
+
+def _read_segment(
+    name: str, data: mmap.mmap, start: Optional[float], end: Optional[float], wanted: Optional[int]
+) -> Iterator[JournalRecord]:
+    if data[:len(_MAGIC)] != _MAGIC:
+        log.warning("Not a journal segment: %s", name)
+        return
+    offset = len(_MAGIC)
+    while offset + _HEADER.size <= len(data):
+        length, crc, at, dir_ = _HEADER.unpack_from(data, offset)
+        offset += _HEADER.size
+        payload = data[offset:offset + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            log.warning("Journal segment %s ends with a damaged record", name)
+            return
+        offset += length
+        if start is not None and at < start:
+            continue
+        if end is not None and at > end:
+            continue
+        if wanted is not None and dir_ != wanted:
+            continue
+        yield JournalRecord(at, "in" if dir_ == IN else "out", payload.decode("utf-8"))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Prints the frames of a journal as JSON lines")
+    p.add_argument("path", help="journal directory")
+    p.add_argument("--from", dest="start", type=float, help="start time (epoch seconds)")
+    p.add_argument("--to", dest="end", type=float, help="end time (epoch seconds)")
+    p.add_argument("--last", type=float, help="the last N seconds")
+    p.add_argument("--direction", choices=tuple(DIRECTIONS))
+    args = p.parse_args()
+
+    start = time.time() - args.last if args.last is not None else args.start
+    for record in read_journal(args.path, start, args.end, args.direction):
+        sys.stdout.write(f'{{"at": {record.at:.6f}, "dir": "{record.direction}", "frame": {record.message}}}\n')
+
+
+if __name__ == "__main__":
+    main()
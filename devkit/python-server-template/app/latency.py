@@ -0,0 +1,147 @@
+import time
+from typing import Any, Dict, Optional
+
+from app.config import LatencyConfig
+from app.frames.frame import Frame
+from app.metrics import (
+    HUB_TO_HANDLER,
+    LATENCY_REJECTED,
+    MAX_LABEL_VALUES,
+    SENDER_TO_HUB_BY_ACTION,
+    SENDER_TO_HUB_BY_SENDER,
+    Histogram,
+)
+
+CLOCK_MODES = ("synced", "relative")
+QUANTILES = (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+
+# Timestamps above this are milliseconds (1e11 s is year 5138)
+_MS_THRESHOLD = 1e11
+
+
+class _ClockOffset:
+    """
+    Minimum of (arrival - timestamp) seen for one sender over a sliding
+    window (two half windows). The smallest offset is the sender clock skew
+    plus the fastest transit time: removing it leaves the queueing and
+    network delay on top of the best case.
+    """
+
+    __slots__ = ("current", "previous", "rotated_at")
+
+    def __init__(self, now: float) -> None:
+        self.current = float("inf")
+        self.previous = float("inf")
+        self.rotated_at = now
+
+    def update(self, offset: float, now: float, half_window: float) -> float:
+        if now - self.rotated_at >= half_window:
+            self.previous = self.current
+            self.current = float("inf")
+            self.rotated_at = now
+        if offset < self.current:
+            self.current = offset
+        return min(self.current, self.previous)
+
+
+class LatencyTracker:
+    """
+    End-to-end latency from the `metadata.timestamp` of incoming frames:
+
+    - sender -> hub: arrival time minus the frame timestamp, per action
+      and per sender
+    - hub -> handler: arrival time to the start of the WS action handler
+
+    Clock skew is handled explicitly by the `clock` mode:
+
+    - synced: sender clocks are trusted. Timestamps slightly in the future
+      (within `tolerance_ms`) count as 0; further in the future, or older
+      than `max_latency_s`, they are rejected and counted, never observed.
+    - relative: for devices without a synchronized clock. The per-sender
+      offset (skew + fastest transit) is estimated and removed, so the
+      histograms show the delay on top of the best observed path.
+
+    Timestamps in milliseconds are detected and converted.
+    """
+
+    def __init__(self, cfg: Optional[LatencyConfig] = None) -> None:
+        self.cfg = cfg or LatencyConfig()
+        if self.cfg.clock not in CLOCK_MODES:
+            raise ValueError(f"Unknown latency clock mode: {self.cfg.clock}")
+        self._offsets: Dict[str, _ClockOffset] = {}
+
+    def frame_received(self, frame: Frame, received_at: float) -> None:
+        """
+        `received_at` is the wall clock time (time.time()) the message
+        carrying the frame was read from the socket.
+        """
+        try:
+            timestamp = frame.timestamp
+        except (TypeError, ValueError):
+            LATENCY_REJECTED.inc("invalid")
+            return
+        if timestamp <= 0:
+            LATENCY_REJECTED.inc("missing")
+            return
+        if timestamp > _MS_THRESHOLD:
+            timestamp /= 1000
+
+        sender = frame.sender_id
+        offset = received_at - timestamp
+
+        if self.cfg.clock == "relative":
+            clock = self._offsets.get(sender)
+            if clock is None:
+                if len(self._offsets) >= MAX_LABEL_VALUES:
+                    LATENCY_REJECTED.inc("too_many_senders")
+                    return
+                clock = self._offsets[sender] = _ClockOffset(received_at)
+            latency = offset - clock.update(offset, received_at, self.cfg.skew_window_s / 2)
+        else:
+            if offset < -self.cfg.tolerance_ms / 1000:
+                LATENCY_REJECTED.inc("future")
+                return
+            if offset > self.cfg.max_latency_s:
+                LATENCY_REJECTED.inc("stale")
+                return
+            latency = max(0.0, offset)
+
+        SENDER_TO_HUB_BY_ACTION.observe(latency, frame.action)
+        SENDER_TO_HUB_BY_SENDER.observe(latency, sender)
+
+    def handler_started(self, action: str, received_at: float) -> None:
+        HUB_TO_HANDLER.observe(max(0.0, time.time() - received_at), action)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Quantiles (seconds, estimated from the histogram buckets) and
+        observation counts, plus the estimated clock offset per sender in
+        relative mode.
+        """
+        return {
+            "clock": self.cfg.clock,
+            "sender_to_hub": {
+                "by_action": _quantiles(SENDER_TO_HUB_BY_ACTION),
+                "by_sender": _quantiles(SENDER_TO_HUB_BY_SENDER),
+            },
+            "hub_to_handler": {
+                "by_action": _quantiles(HUB_TO_HANDLER),
+            },
+            "clock_offsets": {
+                sender: min(clock.current, clock.previous)
+                for sender, clock in self._offsets.items()
+            },
+            "rejected": {
+                key[0]: value for key, value in LATENCY_REJECTED.items()
+            },
+        }
+
+
+def _quantiles(histogram: Histogram) -> Dict[str, Dict[str, Any]]:
+    out = {}
+    for labels in histogram.label_values():
+        stats: Dict[str, Any] = {"count": histogram.count(*labels)}
+        for name, q in QUANTILES:
+            stats[name] = histogram.quantile(q, *labels)
+        out[labels[0]] = stats
+    return out
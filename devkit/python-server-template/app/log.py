@@ -0,0 +1,97 @@
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from app.config import LoggingConfig
+
+ROOT = "mycelia"
+CATEGORIES = ("ws", "hub", "bus", "federation", "frames", "controllers", "http", "rules")
+
+_frames = logging.getLogger(f"{ROOT}.frames")
+_frame_sampling: Dict[str, int] = {}
+_frame_counters: Dict[str, int] = {}
+
+
+def get_logger(category: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT}.{category}")
+
+
+# Arguments that cannot change before the listener thread formats them
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Hands records to the background thread: message formatting happens in
+    the listener thread, never on the event loop. Only records whose `%`
+    arguments are immutable are deferred; others (dicts, lists of hub
+    state...) are formatted here, as they could change or be mutated while
+    the record waits. Records are dropped when the queue is full instead of
+    blocking the caller.
+    """
+
+    def __init__(self, q: queue.Queue) -> None:
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(a, _IMMUTABLE_ARGS) for a in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(cfg: LoggingConfig) -> QueueListener:
+    """
+    Routes every `mycelia.*` logger through a bounded queue flushed to stdout
+    by a background thread. Returns the started listener (call `.stop()` on
+    shutdown to flush pending records).
+    """
+    global _frame_sampling
+    _frame_sampling = {action: max(1, int(every)) for action, every in cfg.frame_sampling.items()}
+    _frame_counters.clear()
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root = logging.getLogger(ROOT)
+    root.handlers.clear()
+    root.addHandler(_DeferredQueueHandler(queue.Queue(maxsize=cfg.queue_size)))
+    root.setLevel(cfg.level.upper())
+    root.propagate = False
+
+    for category, level in cfg.categories.items():
+        get_logger(category).setLevel(level.upper())
+
+    listener = QueueListener(root.handlers[0].queue, output, respect_handler_level=False)
+    listener.start()
+    return listener
+
+
+def log_frame(direction: str, action: Optional[str], message: str) -> None:
+    """
+    Frame traffic is logged at DEBUG on `mycelia.frames`, one frame out of N
+    per action when `frame_sampling` sets N. Costs a single level check when
+    DEBUG is off.
+    """
+    if not _frames.isEnabledFor(logging.DEBUG):
+        return
+
+    key = action or "*"
+    every = _frame_sampling.get(key, _frame_sampling.get("*", 1))
+    if every > 1:
+        count = _frame_counters.get(key, 0)
+        _frame_counters[key] = count + 1
+        if count % every:
+            return
+
+    _frames.debug("%s %s", direction, message)
@@ -0,0 +1,266 @@
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple, TypeVar
+
+# Labels coming from clients (actions, sender ids) are capped so a buggy or
+# hostile device cannot grow the registry without bound.
+MAX_LABEL_VALUES = 500
+OTHER = "_other"
+
+LabelValues = Tuple[str, ...]
+M = TypeVar("M", bound="_Metric")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    Base of the registry metrics.
+
+    Everything is updated from the event loop thread only, so values are
+    plain numbers in dicts: no locks on the hot paths.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: LabelValues, store: dict) -> LabelValues:
+        if labels in store or len(store) < MAX_LABEL_VALUES:
+            return labels
+        return tuple(OTHER for _ in labels)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {} if self.label_names else {(): 0}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        values = self._values
+        key = self._key(labels, values)
+        values[key] = values.get(key, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def items(self) -> List[Tuple[LabelValues, float]]:
+        return list(self._values.items())
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(v)}"
+            for key, v in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {} if self.label_names else {(): 0}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[self._key(labels, self._values)] = value
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(v)}"
+            for key, v in self._values.items()
+        ]
+
+
+class Histogram(_Metric):
+    """
+    Fixed buckets (upper bounds, ascending). `observe` is one bisect and two
+    additions; cumulative counts are only computed when rendering.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Iterable[float], labels: Iterable[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (+ one for +Inf), sum]
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        if not self.label_names:
+            self._series[()] = ([0] * (len(self.buckets) + 1), [0.0])
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            labels = self._key(labels, self._series)
+            series = self._series.get(labels)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[labels] = series
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def quantile(self, q: float, *labels: str) -> Optional[float]:
+        """
+        Estimated quantile (0..1), interpolated inside the bucket like
+        Prometheus `histogram_quantile`. None without observations.
+        """
+        series = self._series.get(labels)
+        if not series:
+            return None
+        counts = series[0]
+        total = sum(counts)
+        if total == 0:
+            return None
+
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    # Beyond the last bucket: best known bound
+                    return self.buckets[-1] if self.buckets else None
+                lower = self.buckets[i - 1] if i > 0 else min(0.0, self.buckets[0])
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1] if self.buckets else None
+
+    def label_values(self) -> List[LabelValues]:
+        return list(self._series)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CONNECTIONS = REGISTRY.register(Gauge(
+    "mycelia_ws_connections", "Connected WebSocket clients on this process"))
+REGISTERED_CLIENTS = REGISTRY.register(Gauge(
+    "mycelia_ws_registered_clients", "Client ids set on this process"))
+SEND_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "mycelia_send_queue_depth", "Messages waiting in outbound client queues", ("stat",)))
+FRAMES_RECEIVED = REGISTRY.register(Counter(
+    "mycelia_frames_received_total", "Frames received from WebSocket clients", ("action",)))
+FRAMES_INVALID = REGISTRY.register(Counter(
+    "mycelia_frames_invalid_total", "WebSocket messages rejected by the frame parser"))
+FRAMES_REJECTED = REGISTRY.register(Counter(
+    "mycelia_frames_rejected_total", "Frames whose value failed the action schema", ("action",)))
+BROADCASTS = REGISTRY.register(Counter(
+    "mycelia_broadcasts_total", "Frames routed by the hub", ("kind",)))
+BROADCAST_FANOUT = REGISTRY.register(Histogram(
+    "mycelia_broadcast_fanout", "Clients a routed frame was queued for",
+    (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)))
+MESSAGES_DROPPED = REGISTRY.register(Counter(
+    "mycelia_messages_dropped_total", "Outbound messages dropped by the slow consumer policy", ("policy",)))
+ADMISSIONS = REGISTRY.register(Counter(
+    "mycelia_ws_admissions_total", "WebSocket upgrades by admission result", ("result",)))
+PRESENCE_DELTAS = REGISTRY.register(Counter(
+    "mycelia_presence_deltas_total", "Batched 00-presence notifications sent"))
+RETAINED_ENTRIES = REGISTRY.register(Gauge(
+    "mycelia_retained_entries", "Frames kept in the retained last-value store"))
+RETAINED_REPLAYED = REGISTRY.register(Counter(
+    "mycelia_retained_replayed_total", "Retained frames replayed to (re)connecting clients"))
+RESUMES = REGISTRY.register(Counter(
+    "mycelia_resumes_total", "Session resumption requests by result", ("result",)))
+RESUME_REPLAYED = REGISTRY.register(Counter(
+    "mycelia_resume_replayed_total", "Missed frames replayed to resuming clients"))
+RESUME_OFFLINE = REGISTRY.register(Gauge(
+    "mycelia_resume_offline_clients", "Disconnected client ids whose replay ring is kept"))
+JOURNAL_RECORDS = REGISTRY.register(Counter(
+    "mycelia_journal_records_total", "Frames written to the frame journal"))
+JOURNAL_DROPPED = REGISTRY.register(Counter(
+    "mycelia_journal_dropped_total", "Frames not journaled (writer behind or write error)"))
+HANDLER_DURATION = REGISTRY.register(Histogram(
+    "mycelia_handler_duration_seconds", "Duration of WS action handlers",
+    (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ("action",)))
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SENDER_TO_HUB_BY_ACTION = REGISTRY.register(Histogram(
+    "mycelia_sender_to_hub_seconds", "Frame timestamp to hub arrival, per action",
+    LATENCY_BUCKETS, ("action",)))
+SENDER_TO_HUB_BY_SENDER = REGISTRY.register(Histogram(
+    "mycelia_sender_to_hub_by_sender_seconds", "Frame timestamp to hub arrival, per sender",
+    LATENCY_BUCKETS, ("sender",)))
+HUB_TO_HANDLER = REGISTRY.register(Histogram(
+    "mycelia_hub_to_handler_seconds", "Hub arrival to WS action handler start",
+    LATENCY_BUCKETS, ("action",)))
+LATENCY_REJECTED = REGISTRY.register(Counter(
+    "mycelia_latency_rejected_total", "Frame timestamps not usable for latency", ("reason",)))
+HANDLER_ERRORS = REGISTRY.register(Counter(
+    "mycelia_handler_errors_total", "WS action handlers that raised", ("action",)))
+HANDLER_TIMEOUTS = REGISTRY.register(Counter(
+    "mycelia_handler_timeouts_total", "WS action handlers cancelled after dispatch.handler_timeout_s", ("action",)))
+HANDLER_JOBS_PENDING = REGISTRY.register(Gauge(
+    "mycelia_handler_jobs_pending", "Frames waiting for or running their WS action handlers"))
+SCHEDULED_PENDING = REGISTRY.register(Gauge(
+    "mycelia_scheduled_actions", "Delayed broadcasts waiting in the scheduler"))
+SCHEDULED_FIRED = REGISTRY.register(Counter(
+    "mycelia_scheduled_fired_total", "Delayed broadcasts sent by the scheduler", ("action",)))
+RULES_FIRED = REGISTRY.register(Counter(
+    "mycelia_rules_fired_total", "Interaction rules whose condition became true", ("rule",)))
+HANDLER_JOBS_DROPPED = REGISTRY.register(Counter(
+    "mycelia_handler_jobs_dropped_total", "Frames not handled because dispatch.max_pending was reached", ("action",)))
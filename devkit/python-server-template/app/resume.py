@@ -0,0 +1,60 @@
+import time
+from collections import deque
+from typing import Deque, List, Tuple
+
+from app.frames.wire import WireMessage
+
+
+def first_sequence() -> int:
+    """
+    Sequence numbers start from the clock (microseconds, below 2^53 for
+    JSON clients): after a restart they keep growing, so sequences seen
+    before it are never mistaken for new ones.
+    """
+    return time.time_ns() // 1000
+
+
+def stamp(message: str, seq: int) -> str:
+    """
+    Adds a top-level `"seq"` to the JSON text of a frame, without parsing
+    it. Messages that are not a JSON object are returned unchanged.
+    """
+    end = message.rstrip()
+    if len(end) < 2 or not end.endswith("}"):
+        return message
+    return f'{end[:-1]}, "seq": {seq}}}'
+
+
+class ReplayRing:
+    """
+    The last `size` messages queued for one client id, with their sequence
+    numbers. `known_from` is the first sequence the ring can vouch for:
+    the one following its creation or its last evicted message.
+    """
+
+    __slots__ = ("_entries", "known_from")
+
+    def __init__(self, size: int, known_from: int) -> None:
+        self._entries: Deque[Tuple[int, WireMessage]] = deque(maxlen=max(1, size))
+        self.known_from = known_from
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def append(self, seq: int, message: WireMessage) -> None:
+        entries = self._entries
+        if len(entries) == entries.maxlen:
+            self.known_from = entries[0][0] + 1
+        entries.append((seq, message))
+
+    def covers(self, last_seq: int) -> bool:
+        """
+        Whether every message after `last_seq` is still in the ring.
+        """
+        return last_seq + 1 >= self.known_from
+
+    def between(self, last_seq: int, up_to: int) -> List[WireMessage]:
+        """
+        Messages with last_seq < seq <= up_to, in order.
+        """
+        return [message for seq, message in self._entries if last_seq < seq <= up_to]
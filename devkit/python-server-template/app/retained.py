@@ -0,0 +1,108 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.config import RetainedConfig
+from app.frames import jsonlib
+from app.log import get_logger
+from app.subscriptions import pattern_matches, validate_pattern
+
+log = get_logger("hub")
+
+REPLAY_MODES = ("register", "connect")
+
+# Retention decision cache, bounded like the dispatch table
+_MAX_CACHED_ACTIONS = 4096
+_SKIP, _BY_ACTION, _BY_SENDER = 0, 1, 2
+
+
+class RetainedStore:
+    """
+    Last routed frame per action (per action and sender for the
+    `per_sender` patterns), replayed to clients that (re)connect so they
+    catch up with the current state without a global rebroadcast.
+
+    Only actions matching `actions` or `per_sender` are kept, at most
+    `max_entries` keys: beyond that new keys are ignored (existing ones are
+    still updated).
+    """
+
+    def __init__(self, cfg: Optional[RetainedConfig] = None) -> None:
+        self.cfg = cfg or RetainedConfig()
+        if self.cfg.replay_on not in REPLAY_MODES:
+            raise ValueError(f"Unknown retained replay mode: {self.cfg.replay_on}")
+        self._actions = [validate_pattern(p) for p in self.cfg.actions]
+        self._per_sender = [validate_pattern(p) for p in self.cfg.per_sender]
+        # (action, sender or "") -> frame text, least recently updated first
+        self._entries: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self._decisions: Dict[str, int] = {}
+        self._full_logged = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._actions or self._per_sender)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _decide(self, action: str) -> int:
+        decision = self._decisions.get(action)
+        if decision is None:
+            if any(pattern_matches(p, action) for p in self._per_sender):
+                decision = _BY_SENDER
+            elif any(pattern_matches(p, action) for p in self._actions):
+                decision = _BY_ACTION
+            else:
+                decision = _SKIP
+            if len(self._decisions) < _MAX_CACHED_ACTIONS:
+                self._decisions[action] = decision
+        return decision
+
+    def update(self, message: str, action: str) -> None:
+        """
+        Keeps `message` (frame JSON text) as the last value of its key.
+        """
+        decision = self._decide(action)
+        if decision == _SKIP:
+            return
+
+        sender = ""
+        if decision == _BY_SENDER:
+            try:
+                sender = str(jsonlib.loads(message)["metadata"].get("senderId", ""))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                return
+
+        key = (action, sender)
+        entries = self._entries
+        if entries.pop(key, None) is None and len(entries) >= self.cfg.max_entries:
+            if not self._full_logged:
+                log.warning("Retained store full (%d entries), new actions are not kept", len(entries))
+                self._full_logged = True
+            return
+        entries[key] = (action, message)
+
+    def snapshot(self, patterns: Iterable[str]) -> List[str]:
+        """
+        Frames of the retained actions matching `patterns`, oldest first.
+        """
+        patterns = list(patterns)
+        return [
+            message
+            for action, message in self._entries.values()
+            if any(pattern_matches(p, action) for p in patterns)
+        ]
+
+    def clear(self, action: Optional[str] = None) -> int:
+        """
+        Forgets every retained frame (or those of one action pattern).
+        Returns the number of dropped entries.
+        """
+        if action is None:
+            dropped = len(self._entries)
+            self._entries.clear()
+        else:
+            keys = [key for key in self._entries if pattern_matches(action, key[0])]
+            for key in keys:
+                del self._entries[key]
+            dropped = len(keys)
+        self._full_logged = False
+        return dropped
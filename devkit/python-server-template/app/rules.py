@@ -0,0 +1,349 @@
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.config import RuleConfig
+from app.frames.frame import Frame
+from app.log import get_logger
+from app.metrics import RULES_FIRED
+from app.scheduler import Scheduler
+from app.schemas import Validator, compile_schema
+
+log = get_logger("rules")
+
+
+class _Node:
+    """
+    One condition. `value(now)` tells whether it holds, `at` when it last
+    became true (for the time windows of the groups above it).
+    """
+
+    __slots__ = ("at",)
+
+    def __init__(self) -> None:
+        self.at = 0.0
+
+    def update(self, action: str, value: Any, now: float) -> None:
+        pass
+
+    def value(self, now: float) -> bool:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        self.at = 0.0
+
+
+class _Value(_Node):
+    """
+    The last value of an action matches (optionally received within the
+    last `within_s` seconds).
+    """
+
+    __slots__ = ("matcher", "within_s", "matched")
+
+    def __init__(self, matcher: Optional[Validator], within_s: float) -> None:
+        super().__init__()
+        self.matcher = matcher
+        self.within_s = within_s
+        self.matched = False
+
+    def update(self, action: str, value: Any, now: float) -> None:
+        self.matched = _matches(self.matcher, value)
+        if self.matched:
+            self.at = now
+
+    def value(self, now: float) -> bool:
+        return self.matched and (not self.within_s or now - self.at <= self.within_s)
+
+    def reset(self) -> None:
+        super().reset()
+        self.matched = False
+
+
+class _Count(_Node):
+    """
+    At least `count` matching frames of an action within the last `within_s`
+    seconds (ever, without a window).
+    """
+
+    __slots__ = ("matcher", "count", "within_s", "times")
+
+    def __init__(self, matcher: Optional[Validator], count: int, within_s: float) -> None:
+        super().__init__()
+        self.matcher = matcher
+        self.count = count
+        self.within_s = within_s
+        self.times: Deque[float] = deque(maxlen=count)
+
+    def update(self, action: str, value: Any, now: float) -> None:
+        if _matches(self.matcher, value):
+            self.times.append(now)
+            self.at = now
+
+    def value(self, now: float) -> bool:
+        times = self.times
+        if len(times) < self.count:
+            return False
+        return not self.within_s or now - times[0] <= self.within_s
+
+    def reset(self) -> None:
+        super().reset()
+        self.times.clear()
+
+
+class _Sequence(_Node):
+    """
+    Matching frames of the steps, in order, the whole sequence within
+    `within_s` seconds. Other frames in between are ignored. Holds once
+    complete, until a new sequence starts.
+    """
+
+    __slots__ = ("steps", "within_s", "index", "started", "done")
+
+    def __init__(self, steps: List[Tuple[str, Optional[Validator]]], within_s: float) -> None:
+        super().__init__()
+        self.steps = steps
+        self.within_s = within_s
+        self.index = 0
+        self.started = 0.0
+        self.done = False
+
+    def update(self, action: str, value: Any, now: float) -> None:
+        if self.index and self.within_s and now - self.started > self.within_s:
+            self.index = 0
+        step_action, matcher = self.steps[self.index]
+        if action == step_action and _matches(matcher, value):
+            if self.index == 0:
+                self.started = now
+                self.done = False
+            self.index += 1
+        elif self.index and action == self.steps[0][0] and _matches(self.steps[0][1], value):
+            # Restart from this frame
+            self.started = now
+            self.index = 1
+            self.done = False
+        else:
+            return
+        if self.index == len(self.steps):
+            self.done = True
+            self.at = now
+            self.index = 0
+
+    def value(self, now: float) -> bool:
+        return self.done
+
+    def reset(self) -> None:
+        super().reset()
+        self.index = 0
+        self.done = False
+
+
+class _Group(_Node):
+    """
+    `all` or `any` of the children. With `within_s`, the children of `all`
+    must have become true within that many seconds of each other.
+    """
+
+    __slots__ = ("children", "require_all", "within_s")
+
+    def __init__(self, children: List[_Node], require_all: bool, within_s: float) -> None:
+        super().__init__()
+        self.children = children
+        self.require_all = require_all
+        self.within_s = within_s
+
+    def value(self, now: float) -> bool:
+        if self.require_all:
+            if not all(child.value(now) for child in self.children):
+                return False
+            times = [child.at for child in self.children]
+            if self.within_s and max(times) - min(times) > self.within_s:
+                return False
+            self.at = max(times)
+            return True
+        held = [child.at for child in self.children if child.value(now)]
+        if not held:
+            return False
+        self.at = max(held)
+        return True
+
+    def reset(self) -> None:
+        super().reset()
+        for child in self.children:
+            child.reset()
+
+
+class _Output:
+    __slots__ = ("action", "value", "delay_s")
+
+    def __init__(self, action: str, value: Any, delay_s: float) -> None:
+        self.action = action
+        self.value = value
+        self.delay_s = delay_s
+
+
+class _Rule:
+    __slots__ = ("name", "root", "outputs", "once", "active", "fired")
+
+    def __init__(self, name: str, root: _Node, outputs: List[_Output], once: bool) -> None:
+        self.name = name
+        self.root = root
+        self.outputs = outputs
+        self.once = once
+        self.active = False  # condition held at the last evaluation
+        self.fired = 0
+
+    def output_key(self, index: int) -> str:
+        return f"rule:{self.name}:{index}"
+
+
+class RuleEngine:
+    """
+    Declarative interaction rules (`rules` in config.json).
+
+    Conditions are compiled at startup into an index action -> conditions
+    and rules, so a frame only updates the conditions over its action and
+    re-evaluates the rules containing them. A rule fires when its condition
+    becomes true (not while it stays true); `once` rules fire a single time
+    until reset. Outputs are broadcasts sent through the scheduler.
+    """
+
+    def __init__(self, rules: List[RuleConfig], scheduler: Scheduler) -> None:
+        self.scheduler = scheduler
+        self._rules: Dict[str, _Rule] = {}
+        # action -> conditions updated by its frames, and the rules to re-evaluate
+        self._nodes: Dict[str, List[_Node]] = {}
+        self._affected: Dict[str, List[_Rule]] = {}
+        # action -> rules reset by its frames
+        self._resets: Dict[str, List[_Rule]] = {}
+
+        for i, cfg in enumerate(rules):
+            name = cfg.name or f"rule-{i}"
+            if name in self._rules:
+                raise ValueError(f"rules[{i}]: duplicate rule name '{name}'")
+            actions: List[str] = []
+            root = self._compile(cfg.when, f"rules[{i}].when", actions)
+            outputs = [self._compile_output(o, f"rules[{i}].then[{j}]") for j, o in enumerate(cfg.then)]
+            rule = self._rules[name] = _Rule(name, root, outputs, cfg.once)
+            for action in dict.fromkeys(actions):
+                self._affected.setdefault(action, []).append(rule)
+            for action in cfg.reset_on:
+                self._resets.setdefault(action, []).append(rule)
+
+    def _compile(self, raw: Any, path: str, actions: List[str]) -> _Node:
+        if not isinstance(raw, dict):
+            raise ValueError(f"{path}: condition must be an object")
+        within_s = float(raw.get("within_s", 0))
+
+        for key in ("all", "any"):
+            if key in raw:
+                children = raw[key]
+                if not isinstance(children, list) or not children:
+                    raise ValueError(f"{path}.{key}: expected a non-empty list of conditions")
+                return _Group(
+                    [self._compile(c, f"{path}.{key}[{i}]", actions) for i, c in enumerate(children)],
+                    key == "all",
+                    within_s,
+                )
+
+        if "sequence" in raw:
+            steps_raw = raw["sequence"]
+            if not isinstance(steps_raw, list) or not steps_raw:
+                raise ValueError(f"{path}.sequence: expected a non-empty list of steps")
+            steps = [self._compile_step(s, f"{path}.sequence[{i}]") for i, s in enumerate(steps_raw)]
+            node: _Node = _Sequence(steps, within_s)
+            for action, _ in steps:
+                self._register(action, node, actions)
+            return node
+
+        action, matcher = self._compile_step(raw, path)
+        if "count" in raw:
+            count = int(raw["count"])
+            if count < 1:
+                raise ValueError(f"{path}.count must be >= 1")
+            node = _Count(matcher, count, within_s)
+        else:
+            node = _Value(matcher, within_s)
+        self._register(action, node, actions)
+        return node
+
+    def _compile_step(self, raw: Any, path: str) -> Tuple[str, Optional[Validator]]:
+        if not isinstance(raw, dict) or not isinstance(raw.get("action"), str):
+            raise ValueError(f"{path}: expected an object with an 'action'")
+        if "equals" in raw and "value" in raw:
+            raise ValueError(f"{path}: use either 'equals' or 'value'")
+        if "equals" in raw:
+            return raw["action"], compile_schema({"const": raw["equals"]}, f"{path}.equals")
+        if "value" in raw:
+            return raw["action"], compile_schema(raw["value"], f"{path}.value")
+        return raw["action"], None
+
+    def _compile_output(self, raw: Any, path: str) -> _Output:
+        if not isinstance(raw, dict) or not isinstance(raw.get("broadcast"), str):
+            raise ValueError(f"{path}: expected an object with a 'broadcast' action")
+        return _Output(raw["broadcast"], raw.get("value"), float(raw.get("delay_s", 0)))
+
+    def _register(self, action: str, node: _Node, actions: List[str]) -> None:
+        nodes = self._nodes.setdefault(action, [])
+        if node not in nodes:
+            nodes.append(node)
+        actions.append(action)
+
+    def on_frame(self, frame: Frame, now: Optional[float] = None) -> None:
+        """
+        Feeds one inbound frame. Frames of actions no rule mentions cost a
+        dictionary lookup (their value is not even decoded).
+        """
+        action = frame.action
+        resets = self._resets.get(action)
+        if resets is not None:
+            for rule in resets:
+                self._reset(rule)
+
+        nodes = self._nodes.get(action)
+        if nodes is None:
+            return
+        if now is None:
+            now = time.time()
+        value = frame.value
+        for node in nodes:
+            node.update(action, value, now)
+
+        for rule in self._affected[action]:
+            held = rule.root.value(now)
+            if held and not rule.active and not (rule.once and rule.fired):
+                self._fire(rule)
+            rule.active = held
+
+    def reset(self, name: Optional[str] = None) -> List[str]:
+        """
+        Resets one rule (all without a name) for the next show cycle:
+        conditions are cleared and pending delayed outputs cancelled.
+        Returns the names of the reset rules, raises KeyError for an unknown
+        name.
+        """
+        rules = [self._rules[name]] if name is not None else list(self._rules.values())
+        for rule in rules:
+            self._reset(rule)
+        return [rule.name for rule in rules]
+
+    def state(self) -> List[Dict[str, Any]]:
+        return [{"name": r.name, "active": r.active, "fired": r.fired, "once": r.once} for r in self._rules.values()]
+
+    def _fire(self, rule: _Rule) -> None:
+        rule.fired += 1
+        RULES_FIRED.inc(rule.name)
+        log.info("Rule '%s' matched", rule.name)
+        for i, output in enumerate(rule.outputs):
+            self.scheduler.schedule_broadcast(output.action, output.value, output.delay_s, key=rule.output_key(i))
+
+    def _reset(self, rule: _Rule) -> None:
+        rule.root.reset()
+        rule.active = False
+        rule.fired = 0
+        for i in range(len(rule.outputs)):
+            self.scheduler.cancel(rule.output_key(i))
+
+
+def _matches(matcher: Optional[Validator], value: Any) -> bool:
+    return matcher is None or matcher(value) is None
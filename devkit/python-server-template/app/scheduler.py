@@ -0,0 +1,188 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import SchedulerConfig
+from app.log import get_logger
+from app import metrics
+from app.ws_hub import WsHub
+
+log = get_logger("hub")
+
+
+class _Entry:
+    __slots__ = ("key", "action", "value", "due", "cancelled")
+
+    def __init__(self, key: str, action: str, value: Any, due: float) -> None:
+        self.key = key
+        self.action = action
+        self.value = value
+        self.due = due
+        self.cancelled = False
+
+
+class Scheduler:
+    """
+    Delayed broadcasts, driven by one task sleeping until the earliest due
+    time of a heap.
+
+    Every entry has a key (given or generated): scheduling with the key of
+    a pending entry replaces it, and `cancel(key)` drops it. Cancelled
+    entries stay in the heap until they reach its top (or the heap is
+    compacted), so scheduling and cancelling are O(log n) and O(1).
+
+    Due times are wall clock times, so with `persist_path` the pending
+    entries are saved (at most every `save_interval_s`) and scheduled again
+    at the next start; those that came due meanwhile fire right away.
+    """
+
+    def __init__(self, hub: WsHub, cfg: Optional[SchedulerConfig] = None, persist_path: Optional[str] = None) -> None:
+        self.hub = hub
+        self.cfg = cfg or SchedulerConfig()
+        self.persist_path = persist_path if persist_path is not None else self.cfg.persist_path
+        self._entries: Dict[str, _Entry] = {}
+        self._heap: List[Tuple[float, int, _Entry]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self._dirty = False
+
+    async def start(self) -> None:
+        if self.persist_path:
+            self._load()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if self._dirty:
+            self._save()
+
+    def schedule_broadcast(self, action: str, value: Any, delay: float, key: Optional[str] = None) -> str:
+        """
+        Broadcasts `action` with `value` in `delay` seconds. Returns the key
+        of the entry (generated when not given).
+        """
+        if key is None:
+            # Random: generated keys must not collide with restored ones
+            key = f"{action}#{uuid.uuid4().hex[:12]}"
+        self._add(_Entry(key, action, value, time.time() + max(0.0, delay)))
+        return key
+
+    def cancel(self, key: str) -> bool:
+        """
+        Drops a pending entry. Returns False when there is none with this key.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        entry.cancelled = True
+        self._changed()
+        return True
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """
+        Pending entries, the next one first.
+        """
+        now = time.time()
+        return [
+            {"key": e.key, "action": e.action, "value": e.value, "due": e.due, "in_s": round(max(0.0, e.due - now), 3)}
+            for e in sorted(self._entries.values(), key=lambda e: e.due)
+        ]
+
+    def collect_metrics(self) -> None:
+        metrics.SCHEDULED_PENDING.set(len(self._entries))
+
+    def _add(self, entry: _Entry) -> None:
+        previous = self._entries.get(entry.key)
+        if previous is not None:
+            previous.cancelled = True
+        self._entries[entry.key] = entry
+
+        # Lazy deletion: rebuild once cancelled entries are the majority
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [item for item in self._heap if not item[2].cancelled]
+            heapq.heapify(self._heap)
+
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (entry.due, next(self._seq), entry))
+        if earliest is None or entry.due < earliest:
+            self._wakeup.set()
+        self._changed()
+
+    async def _run(self) -> None:
+        while True:
+            # Re-read: compaction replaces the list
+            heap = self._heap
+            while heap and heap[0][2].cancelled:
+                heapq.heappop(heap)
+            if not heap:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            delay = heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            entry = heapq.heappop(heap)[2]
+            del self._entries[entry.key]
+            self._changed()
+            try:
+                await self.hub.broadcast_action(entry.action, entry.value)
+                metrics.SCHEDULED_FIRED.inc(entry.action)
+            except Exception as e:
+                log.exception("Scheduled broadcast failed (%s): %s", entry.key, e)
+
+    def _changed(self) -> None:
+        if not self.persist_path:
+            return
+        self._dirty = True
+        if self._save_handle is None:
+            loop = asyncio.get_running_loop()
+            self._save_handle = loop.call_later(self.cfg.save_interval_s, self._save)
+
+    def _save(self) -> None:
+        self._save_handle = None
+        self._dirty = False
+        data = [
+            {"key": e.key, "action": e.action, "value": e.value, "due": e.due}
+            for e in self._entries.values()
+        ]
+        tmp = f"{self.persist_path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.persist_path)
+        except (OSError, TypeError, ValueError) as e:
+            log.error("Cannot save scheduled actions to %s: %s", self.persist_path, e)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            entries = [_Entry(str(d["key"]), str(d["action"]), d.get("value"), float(d["due"])) for d in data]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.error("Cannot load scheduled actions from %s: %s", self.persist_path, e)
+            return
+        for entry in entries:
+            self._add(entry)
+        log.info("%d scheduled action(s) restored from %s", len(entries), self.persist_path)
@@ -0,0 +1,166 @@
+import re
+from typing import Any, Callable, Dict, List, Optional, Union
+
+# Returns None when the value is valid, else a short error message
+Validator = Callable[[Any], Optional[str]]
+
+_TYPES: Dict[str, Callable[[Any], bool]] = {
+    "null": lambda v: v is None,
+    "boolean": lambda v: isinstance(v, bool),
+    # bool is an int subclass: exclude it from numbers
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "string": lambda v: isinstance(v, str),
+    "array": lambda v: isinstance(v, list),
+    "object": lambda v: isinstance(v, dict),
+}
+
+_KEYWORDS = {
+    "type", "enum", "const", "minimum", "maximum", "minLength", "maxLength", "pattern",
+    "items", "minItems", "maxItems", "properties", "required", "additionalProperties",
+}
+
+
+def compile_schema(schema: Union[str, Dict[str, Any]], path: str = "value") -> Validator:
+    """
+    Compiles a value schema (a small JSON Schema subset) into one function.
+
+    Supported: type (a name or a list of names), enum, const, minimum,
+    maximum, minLength, maxLength, pattern, items, minItems, maxItems,
+    properties, required, additionalProperties (bool). A bare type name
+    ("boolean") is a shorthand for {"type": "boolean"}.
+
+    Raises ValueError on an invalid schema, so config errors show at startup.
+    """
+    if isinstance(schema, str):
+        schema = {"type": schema}
+    if not isinstance(schema, dict):
+        raise ValueError(f"Schema of {path} must be an object or a type name")
+    unknown = set(schema) - _KEYWORDS
+    if unknown:
+        raise ValueError(f"Schema of {path}: unsupported keyword(s) {', '.join(sorted(unknown))}")
+
+    checks: List[Validator] = []
+
+    if "type" in schema:
+        names = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        for name in names:
+            if name not in _TYPES:
+                raise ValueError(f"Schema of {path}: unknown type '{name}'")
+        tests = [_TYPES[name] for name in names]
+        expected = " or ".join(names)
+        if len(tests) == 1:
+            test = tests[0]
+            checks.append(lambda v: None if test(v) else f"{path} must be {expected}")
+        else:
+            checks.append(lambda v: None if any(t(v) for t in tests) else f"{path} must be {expected}")
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+        checks.append(lambda v: None if _in(v, allowed) else f"{path} must be one of {allowed}")
+
+    if "const" in schema:
+        const = [schema["const"]]
+        checks.append(lambda v: None if _in(v, const) else f"{path} must be {const[0]!r}")
+
+    if "minimum" in schema:
+        low = schema["minimum"]
+        checks.append(lambda v: f"{path} must be >= {low}" if _is_number(v) and v < low else None)
+
+    if "maximum" in schema:
+        high = schema["maximum"]
+        checks.append(lambda v: f"{path} must be <= {high}" if _is_number(v) and v > high else None)
+
+    if "minLength" in schema:
+        min_length = int(schema["minLength"])
+        checks.append(lambda v: f"{path} is shorter than {min_length}" if isinstance(v, str) and len(v) < min_length else None)
+
+    if "maxLength" in schema:
+        max_length = int(schema["maxLength"])
+        checks.append(lambda v: f"{path} is longer than {max_length}" if isinstance(v, str) and len(v) > max_length else None)
+
+    if "pattern" in schema:
+        try:
+            search = re.compile(schema["pattern"]).search
+        except re.error as e:
+            raise ValueError(f"Schema of {path}: invalid pattern: {e}")
+        checks.append(lambda v: f"{path} does not match {schema['pattern']}" if isinstance(v, str) and not search(v) else None)
+
+    if "minItems" in schema:
+        min_items = int(schema["minItems"])
+        checks.append(lambda v: f"{path} has fewer than {min_items} items" if isinstance(v, list) and len(v) < min_items else None)
+
+    if "maxItems" in schema:
+        max_items = int(schema["maxItems"])
+        checks.append(lambda v: f"{path} has more than {max_items} items" if isinstance(v, list) and len(v) > max_items else None)
+
+    if "items" in schema:
+        item = compile_schema(schema["items"], f"{path}[]")
+
+        def check_items(v: Any) -> Optional[str]:
+            if isinstance(v, list):
+                for element in v:
+                    error = item(element)
+                    if error:
+                        return error
+            return None
+        checks.append(check_items)
+
+    if "required" in schema:
+        required = list(schema["required"])
+
+        def check_required(v: Any) -> Optional[str]:
+            if isinstance(v, dict):
+                for key in required:
+                    if key not in v:
+                        return f"{path}.{key} is required"
+            return None
+        checks.append(check_required)
+
+    if "properties" in schema:
+        properties = [(key, compile_schema(sub, f"{path}.{key}")) for key, sub in schema["properties"].items()]
+
+        def check_properties(v: Any) -> Optional[str]:
+            if isinstance(v, dict):
+                for key, validate in properties:
+                    if key in v:
+                        error = validate(v[key])
+                        if error:
+                            return error
+            return None
+        checks.append(check_properties)
+
+    if schema.get("additionalProperties", True) is False:
+        known = set(schema.get("properties", {}))
+
+        def check_additional(v: Any) -> Optional[str]:
+            if isinstance(v, dict):
+                for key in v:
+                    if key not in known:
+                        return f"{path}.{key} is not allowed"
+            return None
+        checks.append(check_additional)
+
+    if not checks:
+        return lambda v: None
+    if len(checks) == 1:
+        return checks[0]
+
+    def validate(v: Any) -> Optional[str]:
+        for check in checks:
+            error = check(v)
+            if error:
+                return error
+        return None
+    return validate
+
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _in(v: Any, allowed: List[Any]) -> bool:
+    # True == 1 in Python: compare types too
+    return any(v == a and type(v) is type(a) for a in allowed) or (
+        _is_number(v) and any(_is_number(a) and v == a for a in allowed)
+    )
@@ -1,62 +1,233 @@
-from aiohttp import web, WSMsgType
+import os
+import time
+from typing import Optional
+from aiohttp import web, WSMsgType, WSCloseCode
 
+from app.admission import AdmissionControl
 from app.config import AppConfig
 from app.ws_hub import WsHub
 from app.http_router import mount_routes
 from app.ws_router import WsActionDispatcher
+from app.ws_runner import HandlerRunner
+from app.frames.codecs import CODECS, JSON, get_codec
 from app.frames.parser import FrameParser
+from app.federation import Federation
+from app.hub_bus import HubBus
+from app.journal import IN, FrameJournal
+from app.latency import LatencyTracker
+from app.rules import RuleEngine
+from app.scheduler import Scheduler
+from app.log import get_logger, log_frame
+from app import metrics
+
+log = get_logger("ws")
+
+# Control frames for the hub itself: handled, never routed to other clients
+CONTROL_ACTIONS = frozenset(("00-subscribe", "00-unsubscribe"))
 
 
 async def ws_handler(request: web.Request) -> web.WebSocketResponse:
     hub: WsHub = request.app["hub"]
     dispatcher: WsActionDispatcher = request.app["ws_dispatcher"]
-
-    ws = web.WebSocketResponse(heartbeat=30)
+    runner: HandlerRunner = request.app["ws_runner"]
+    rules: RuleEngine = request.app["rules"]
+    latency: LatencyTracker = request.app["latency"]
+    journal: Optional[FrameJournal] = request.app["journal"]
+
+    # Optional connect-time subscriptions: /ws?subscribe=01-*,00-new-client&echo=1
+    patterns = None
+    if "subscribe" in request.query:
+        patterns = [p.strip() for p in request.query["subscribe"].split(",") if p.strip()]
+    echo = request.query.get("echo", "0").lower() in ("1", "true", "yes")
+    batch = request.query.get("batch", "0").lower() in ("1", "true", "yes")
+
+    # Session resumption: /ws?last_seq=<last "seq" received before the drop>
+    resume_from = None
+    if "last_seq" in request.query:
+        try:
+            resume_from = int(request.query["last_seq"])
+        except ValueError:
+            raise web.HTTPBadRequest(text="last_seq must be an integer")
+
+    # Frame codec: ?codec=msgpack, or the negotiated WebSocket subprotocol
+    codec = None
+    if "codec" in request.query:
+        try:
+            codec = get_codec(request.query["codec"])
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+
+    # Reconnect storms: upgrades beyond the accept rate wait, or are refused
+    admission: AdmissionControl = request.app["admission"]
+    if not await admission.acquire():
+        log.debug("Connection refused by admission control (%d pending)", admission.pending)
+        raise web.HTTPServiceUnavailable(
+            text="Too many connections, retry later",
+            headers={"Retry-After": str(admission.retry_after())},
+        )
+
+    ws = web.WebSocketResponse(heartbeat=30, protocols=tuple(CODECS))
     await ws.prepare(request)
-    await hub.add(ws)
+    if codec is None:
+        codec = CODECS.get(ws.ws_protocol or "", JSON)
+
+    try:
+        await hub.add(ws, patterns=patterns, echo=echo, batch=batch, codec=codec, resume_from=resume_from)
+    except ValueError as e:
+        log.warning("Connection refused: %s", e)
+        await ws.close(code=WSCloseCode.POLICY_VIOLATION, message=str(e).encode("utf-8"))
+        return ws
 
     try:
         async for msg in ws:
-            if msg.type != WSMsgType.TEXT:
+            if msg.type == WSMsgType.TEXT:
+                frame_codec = JSON
+            elif msg.type == WSMsgType.BINARY and codec.binary:
+                frame_codec = codec
+            else:
                 continue
 
             raw = msg.data
+            received_at = time.time()
 
-            # Validate + parse new frame
+            # Validate + parse new frame (or batch of frames)
             try:
-                frame = FrameParser(raw).parse()
+                parser = FrameParser(raw, frame_codec)
+                frames = parser.parse_all()
             except Exception as e:
                 # invalid input -> ignore (or you can reply with an error message)
-                print(f"[WS] Invalid frame ignored: {e}")
+                log.warning("Invalid frame ignored: %s", e)
+                metrics.FRAMES_INVALID.inc()
                 continue
 
-            # If action is configured, call controller
-            try:
-                handled = await dispatcher.dispatch(frame, ws)
-            except Exception as e:
-                print(f"[WS] Handler error for action={frame.action}: {e}")
-                handled = True  # treated as handled, but failed
-
-            # Broadcast behavior:
-            # - if you still want to broadcast everything, keep this:
-            await hub.broadcast(raw)
-
-            # OR if you want broadcast only when not handled:
-            # if not handled:
-            #     await hub.broadcast(raw, sender=ws)
+            for frame in frames:
+                # Routing always carries the JSON text as received; clients get it transcoded to their codec.
+                # A binary frame whose value has no JSON form (e.g. MessagePack bin) cannot be routed.
+                try:
+                    message = frame.raw_json
+                except (TypeError, ValueError) as e:
+                    log.warning("Invalid frame ignored (%s): %s", frame.action, e)
+                    metrics.FRAMES_INVALID.inc()
+                    continue
+                log_frame("<", frame.action, message)
+                if journal is not None:
+                    journal.record(IN, message)
+                metrics.FRAMES_RECEIVED.inc(frame.action)
+
+                # Value schema of the action: bad frames are neither dispatched nor routed
+                error = dispatcher.validate(frame)
+                if error:
+                    log.warning("Frame rejected from %s (%s): %s", frame.sender_id, frame.action, error)
+                    metrics.FRAMES_REJECTED.inc(frame.action)
+                    continue
+
+                latency.frame_received(frame, received_at)
+                rules.on_frame(frame, received_at)
+
+                # If action is configured, schedule its controllers (never awaited here)
+                handled = runner.submit(frame, ws, received_at)
+
+                if frame.action in CONTROL_ACTIONS:
+                    continue
+
+                # Batched presence: registrations are announced by the 00-presence delta only
+                if frame.action == "00-new-connection" and hub.cfg.presence_mode == "batched":
+                    continue
+
+                # Addressed frames (metadata.receiverId) only go to their receivers
+                if frame.receiver_ids:
+                    await hub.send_to(frame.receiver_ids, message)
+                    continue
+
+                # Broadcast behavior:
+                # - route to the clients subscribed to this action (sender only if it opted in to echo):
+                await hub.broadcast(message, action=frame.action, sender=ws)
+
+                # OR if you want broadcast only when not handled:
+                # if not handled:
+                #     await hub.broadcast(message, action=frame.action, sender=ws)
 
     finally:
+        runner.connection_closed(ws)
         await hub.remove(ws)
 
     return ws
 
 
-def build_app(cfg: AppConfig) -> web.Application:
+def build_app(cfg: AppConfig, bus: Optional[HubBus] = None) -> web.Application:
+    """
+    `bus` links the hub to the other workers in multi-process mode.
+    """
     app = web.Application()
 
-    app["hub"] = WsHub(app)
+    app["hub"] = WsHub(app, cfg.hub, cfg.retained, cfg.resume)
+    if bus is not None:
+        async def _attach_bus(app: web.Application) -> None:
+            await app["hub"].attach_bus(bus)
+
+        async def _detach_bus(app: web.Application) -> None:
+            await app["hub"].detach_bus()
+
+        app.on_startup.append(_attach_bus)
+        app.on_cleanup.append(_detach_bus)
+    if cfg.federation.enabled:
+        federation = Federation(app["hub"], cfg.server.id, cfg.federation)
+        app["hub"].attach_federation(federation)
+        app.router.add_get(cfg.federation.path, federation.handle_inbound)
+
+        async def _start_federation(app: web.Application) -> None:
+            await federation.start()
+
+        async def _stop_federation(app: web.Application) -> None:
+            await federation.stop()
+
+        app.on_startup.append(_start_federation)
+        app.on_shutdown.append(_stop_federation)
     app["server_id"] = cfg.server.id
+    app["admission"] = AdmissionControl(cfg.admission)
+    app["latency"] = LatencyTracker(cfg.latency)
     app["ws_dispatcher"] = WsActionDispatcher(app, cfg)
+    app["ws_runner"] = HandlerRunner(app["ws_dispatcher"], cfg.dispatch)
+
+    async def _stop_runner(app: web.Application) -> None:
+        await app["ws_runner"].close()
+
+    app.on_shutdown.append(_stop_runner)
+
+    # One persistence file per worker: each one restores what it scheduled
+    persist_path = cfg.scheduler.persist_path
+    if persist_path and bus is not None:
+        persist_path = f"{persist_path}.{bus.worker_id}"
+    app["scheduler"] = Scheduler(app["hub"], cfg.scheduler, persist_path)
+
+    async def _start_scheduler(app: web.Application) -> None:
+        await app["scheduler"].start()
+
+    async def _stop_scheduler(app: web.Application) -> None:
+        await app["scheduler"].stop()
+
+    app.on_startup.append(_start_scheduler)
+    app.on_shutdown.append(_stop_scheduler)
+    app["rules"] = RuleEngine(cfg.rules, app["scheduler"])
+
+    # Frame journal, one directory per worker
+    app["journal"] = None
+    if cfg.journal.enabled:
+        journal_path = cfg.journal.path
+        if bus is not None:
+            journal_path = os.path.join(journal_path, f"worker-{bus.worker_id}")
+        journal = app["journal"] = FrameJournal(cfg.journal, journal_path)
+        app["hub"].attach_journal(journal)
+
+        async def _start_journal(app: web.Application) -> None:
+            await journal.start()
+
+        async def _stop_journal(app: web.Application) -> None:
+            await journal.stop()
+
+        app.on_startup.append(_start_journal)
+        # After shutdown, so the last frames sent are kept
+        app.on_cleanup.append(_stop_journal)
 
     # websocket route
     app.router.add_get(cfg.server.ws_path, ws_handler)
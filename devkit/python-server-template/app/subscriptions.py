@@ -0,0 +1,79 @@
+from typing import Dict, FrozenSet, Generic, Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+def validate_pattern(pattern: str) -> str:
+    """
+    A pattern is an exact action (`01-wind-toggle`), a prefix (`01-*`) or `*`.
+    """
+    if not isinstance(pattern, str) or not pattern:
+        raise ValueError("Subscription pattern must be a non-empty string")
+    if "*" in pattern[:-1]:
+        raise ValueError(f"Invalid subscription pattern '{pattern}': '*' is only allowed at the end")
+    return pattern
+
+
+def pattern_matches(pattern: str, action: str) -> bool:
+    if pattern.endswith("*"):
+        return action.startswith(pattern[:-1])
+    return pattern == action
+
+
+class SubscriptionIndex(Generic[T]):
+    """
+    Index from action patterns to subscribers.
+
+    Exact patterns are a single dict lookup. Prefix patterns are stored by
+    prefix and matched by probing every prefix of the action, so a lookup
+    costs O(len(action) + subscribers) whatever the number of clients.
+
+    Subscriber sets are frozensets replaced on change (copy-on-write): a
+    lookup can return them as-is, without copying.
+    """
+
+    def __init__(self) -> None:
+        self._exact: Dict[str, FrozenSet[T]] = {}
+        self._prefixes: Dict[str, FrozenSet[T]] = {}
+
+    def _bucket(self, pattern: str) -> tuple[Dict[str, FrozenSet[T]], str]:
+        if pattern.endswith("*"):
+            return self._prefixes, pattern[:-1]
+        return self._exact, pattern
+
+    def add(self, pattern: str, subscriber: T) -> None:
+        index, key = self._bucket(pattern)
+        index[key] = index.get(key, frozenset()) | {subscriber}
+
+    def discard(self, pattern: str, subscriber: T) -> None:
+        index, key = self._bucket(pattern)
+        subscribers = index.get(key)
+        if subscribers is None or subscriber not in subscribers:
+            return
+        subscribers = subscribers - {subscriber}
+        if subscribers:
+            index[key] = subscribers
+        else:
+            del index[key]
+
+    def discard_all(self, patterns: Iterable[str], subscriber: T) -> None:
+        for pattern in patterns:
+            self.discard(pattern, subscriber)
+
+    def patterns(self) -> set[str]:
+        """
+        Every pattern with at least one subscriber.
+        """
+        return set(self._exact) | {prefix + "*" for prefix in self._prefixes}
+
+    def match(self, action: str) -> FrozenSet[T]:
+        matched: FrozenSet[T] = self._exact.get(action, frozenset())
+
+        if self._prefixes:
+            for i in range(len(action) + 1):
+                subscribers = self._prefixes.get(action[:i])
+                if subscribers:
+                    # Only allocate when more than one pattern matches
+                    matched = matched | subscribers if matched else subscribers
+
+        return matched
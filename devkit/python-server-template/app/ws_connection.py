@@ -0,0 +1,200 @@
+import asyncio
+from aiohttp import web
+from typing import Optional, Union
+from app.frames.codecs import JSON, Codec
+from app.frames.wire import WireMessage
+from app.log import get_logger
+from app.metrics import MESSAGES_DROPPED
+from app.resume import ReplayRing
+
+log = get_logger("hub")
+
+
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "drop_newest", "disconnect")
+
+# Set once the aiohttp writer is found without the attributes _write_prebuilt relies on
+_raw_writes_unsupported = False
+
+
+async def _write_prebuilt(ws: web.WebSocketResponse, message: WireMessage, codec: Codec) -> bool:
+    """
+    Writes the pre-built WebSocket frame of a message straight to the
+    transport, as aiohttp's own writer does. Returns False without writing
+    when that is not possible, the caller then goes through send_str or
+    send_bytes:
+      - the socket needs a per-message encoding (permessage-deflate, mask)
+      - the aiohttp writer lacks the private attributes used here (another
+        aiohttp version), which is logged once
+    Raises ConnectionResetError once the socket is closing, so no data
+    frame follows a CLOSE frame.
+    """
+    global _raw_writes_unsupported
+    if _raw_writes_unsupported:
+        return False
+    writer = getattr(ws, "_writer", None)
+    if writer is None:
+        return False
+    try:
+        plain = not writer.compress and not writer.use_mask
+        closing = writer._closing
+        transport = writer.transport
+        protocol = writer.protocol
+        drain = protocol._drain_helper
+    except AttributeError as e:
+        _raw_writes_unsupported = True
+        log.warning("Pre-built frames disabled, unexpected aiohttp writer: %s", e)
+        return False
+    if not plain:
+        return False
+
+    if ws.closed or closing or transport is None or transport.is_closing():
+        raise ConnectionResetError("Cannot write to closing transport")
+    transport.write(message.frame_for(codec))
+    if protocol.writing_paused:
+        await drain()
+    return True
+
+
+class WsConnection:
+    """
+    One connected WebSocket client.
+
+    Owns a bounded outbound queue drained by its own writer task, so a slow
+    client never stalls delivery to the others. When the queue is full the
+    slow-consumer policy decides what happens:
+      - drop_oldest: discard the oldest pending message
+      - drop_newest: discard the message being enqueued
+      - disconnect:  close the connection
+
+    With a batch window (seconds), the writer waits that long after the
+    first pending frame and sends everything queued meanwhile as one batch
+    envelope (a JSON array of frames, at most `batch_max` per message).
+    """
+
+    def __init__(
+        self,
+        ws: web.WebSocketResponse,
+        queue_size: int,
+        policy: str,
+        batch_window: float = 0.0,
+        batch_max: int = 64,
+        codec: Codec = JSON,
+    ) -> None:
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+
+        self.ws = ws
+        self.policy = policy
+        self.dropped = 0
+        self.batch_window = batch_window
+        self.batch_max = batch_max
+        self.codec = codec
+        # Action patterns this client receives, and whether its own frames
+        # are echoed back to it. Filled by WsHub.
+        self.patterns: set[str] = set()
+        self.default_patterns = True
+        self.echo = False
+        # Session resumption: replay ring of the registered client, last
+        # sequence it presented, and hub sequence when it connected
+        self.ring: Optional[ReplayRing] = None
+        self.resume_from: Optional[int] = None
+        self.added_seq = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._writer: Optional[asyncio.Task] = None
+        self._closer: Optional[asyncio.Task] = None
+
+    @property
+    def closed(self) -> bool:
+        return self.ws.closed
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def stop(self) -> None:
+        if self._writer is None:
+            return
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+
+    def enqueue(self, message: Union[str, WireMessage]) -> bool:
+        """
+        Non-blocking enqueue. Returns False if the message was not queued.
+        """
+        if self.closed:
+            return False
+
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        self.dropped += 1
+        MESSAGES_DROPPED.inc(self.policy)
+
+        if self.policy == "drop_oldest":
+            self._queue.get_nowait()
+            self._queue.put_nowait(message)
+            return True
+
+        if self.policy == "disconnect" and self._closer is None:
+            log.warning("Slow consumer disconnected after %d dropped messages.", self.dropped)
+            self._closer = asyncio.create_task(self.ws.close())
+
+        return False
+
+    async def deliver(self, message: Union[str, WireMessage]) -> None:
+        """
+        Writes one message to the socket, bypassing the queue.
+        Messages are JSON text, transcoded to the connection codec if needed.
+        """
+        codec = self.codec
+
+        if isinstance(message, str):
+            if codec.binary:
+                await self.ws.send_bytes(codec.dumps(JSON.loads(message)))
+            else:
+                await self.ws.send_str(message)
+            return
+
+        # Pre-built frames can only be written as-is on a plain server socket:
+        # permessage-deflate needs a per-connection compressor.
+        if await _write_prebuilt(self.ws, message, codec):
+            return
+        if codec.binary:
+            await self.ws.send_bytes(message.payload_for(codec))
+        else:
+            await self.ws.send_str(message.text)
+
+    async def _collect_batch(self, first: Union[str, WireMessage]) -> Union[str, WireMessage]:
+        await asyncio.sleep(self.batch_window)
+
+        batch = [first]
+        while len(batch) < self.batch_max and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+        if len(batch) == 1:
+            return first
+
+        texts = [m.text if isinstance(m, WireMessage) else m for m in batch]
+        return "[" + ",".join(texts) + "]"
+
+    async def _write_loop(self) -> None:
+        while True:
+            message = await self._queue.get()
+            if self.batch_window > 0:
+                message = await self._collect_batch(message)
+            try:
+                await self.deliver(message)
+            except Exception:
+                # The read loop notices the dead socket and removes the client.
+                return
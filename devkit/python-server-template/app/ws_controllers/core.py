@@ -1,13 +1,13 @@
 from aiohttp import web
 from app.ws_controllers.base import WsController
 from app.frames.frame import Frame
-from typing import List
+from typing import Any, List
 
 
 class CoreController(WsController):
 
     async def on_ping(self, frame: Frame, ws: web.WebSocketResponse) -> None:
-        print("[WS] PING received from", frame.sender_id)
+        self.log.info("PING received from %s", frame.sender_id)
         await self.hub.send_action(ws, "pong", "pong")
 
     async def on_new_connection(self, frame: Frame, ws: web.WebSocketResponse) -> None:
@@ -15,9 +15,36 @@ class CoreController(WsController):
 
     async def on_get_connected_clients(self, frame: Frame, ws: web.WebSocketResponse) -> None:
         data: List[dict] = []
-        for id, client in self.hub._setted_clients.items():
+        for id, is_connected in (await self.hub.connected_clients()).items():
             data.append({
                 "clientId": id,
-                "isConnected": client is not None
+                "isConnected": is_connected
             })
-        await self.hub.send_action(ws, "connected-clients", data)
\ No newline at end of file
+        await self.hub.send_action(ws, "connected-clients", data)
+
+    async def on_subscribe(self, frame: Frame, ws: web.WebSocketResponse) -> None:
+        patterns, echo = self._read_subscription(frame.value)
+        if echo is not None:
+            await self.hub.set_echo(ws, echo)
+        subscribed = await self.hub.subscribe(ws, patterns)
+        await self.hub.send_action(ws, "00-subscriptions", subscribed)
+
+    async def on_unsubscribe(self, frame: Frame, ws: web.WebSocketResponse) -> None:
+        patterns, _ = self._read_subscription(frame.value)
+        subscribed = await self.hub.unsubscribe(ws, patterns)
+        await self.hub.send_action(ws, "00-subscriptions", subscribed)
+
+    @staticmethod
+    def _read_subscription(value: Any) -> tuple[List[str], Any]:
+        """
+        Accepts "01-*", ["01-*", "00-new-client"] or {"actions": [...], "echo": true}.
+        """
+        echo = None
+        if isinstance(value, dict):
+            echo = value.get("echo")
+            value = value.get("actions", [])
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list):
+            raise ValueError("Subscription value must be a string, a list or an object")
+        return value, echo
@@ -1,7 +1,6 @@
 from aiohttp import web
 from app.ws_controllers.base import WsController
 from app.frames.frame import Frame
-import asyncio
 
 
 class CoreController(WsController):
@@ -17,19 +16,19 @@ class CoreController(WsController):
     async def on_shroom_forest_lighten(self, frame: Frame, ws: web.WebSocketResponse) -> None:
         if frame.value == True:
             self._shroom_forest_lighten = True
-            print(f"[WS] Shroom forest lighten set to True")
+            self.log.info("Shroom forest lighten set to True")
         await self._check_interaction_1(ws)
     
     async def on_wind_toggle(self, frame: Frame, ws: web.WebSocketResponse) -> None:
         if frame.value == True:
             self._wind_toggle = True
-            print(f"[WS] Wind toggle set to True")
+            self.log.info("Wind toggle set to True")
         await self._check_interaction_1(ws)
     
     async def on_rain_toggle(self, frame: Frame, ws: web.WebSocketResponse) -> None:
         if frame.value == True:
             self._rain_toggle = True
-            print(f"[WS] Rain toggle set to True")
+            self.log.info("Rain toggle set to True")
         await self._check_interaction_1(ws)
 
     async def _check_interaction_1(self, ws: web.WebSocketResponse) -> None:
@@ -38,8 +37,6 @@ class CoreController(WsController):
 
         if self._shroom_forest_lighten and self._wind_toggle and self._rain_toggle:
             self._interaction_1_done = True
-            # wait 10 seconds
-            await asyncio.sleep(10)
-            print("[WS] Interaction condition met! Broadcasting 01-interaction-done")
-            # Broadcast to all clients
-            await self.hub.broadcast_action("01-interaction-done", True)
\ No newline at end of file
+            self.log.info("Interaction condition met! Broadcasting 01-interaction-done in 10 s")
+            # Broadcast to all clients in 10 seconds (cancel with the key)
+            self.scheduler.schedule_broadcast("01-interaction-done", True, 10, key="01-interaction-done")
\ No newline at end of file
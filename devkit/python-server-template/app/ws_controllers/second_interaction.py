@@ -1,7 +1,6 @@
 from aiohttp import web
 from app.ws_controllers.base import WsController
 from app.frames.frame import Frame
-import asyncio
 
 
 class CoreController(WsController):
@@ -16,13 +15,13 @@ class CoreController(WsController):
     async def on_sphero_impact(self, frame: Frame, ws: web.WebSocketResponse) -> None:
         if frame.value == True:
             self._sphero_impact = True
-            print(f"[WS] Sphero impact set to True")
+            self.log.info("Sphero impact set to True")
         await self._check_interaction_2(ws)
 
     async def on_balance_toggle(self, frame: Frame, ws: web.WebSocketResponse) -> None:
         if frame.value == True:
             self._balance_toggle = True
-            print(f"[WS] Balance toggle set to True")
+            self.log.info("Balance toggle set to True")
         await self._check_interaction_2(ws)
 
     async def _check_interaction_2(self, ws: web.WebSocketResponse) -> None:
@@ -31,9 +30,7 @@ class CoreController(WsController):
 
         if self._sphero_impact and self._balance_toggle:
             self._interaction_2_done = True
-            # wait 10 seconds
-            await asyncio.sleep(10)
-            print("[WS] Interaction condition met! Broadcasting 02-interaction-done")
-            # Broadcast to all clients
-            await self.hub.broadcast_action("02-interaction-done", True)
+            self.log.info("Interaction condition met! Broadcasting 02-interaction-done in 10 s")
+            # Broadcast to all clients in 10 seconds (cancel with the key)
+            self.scheduler.schedule_broadcast("02-interaction-done", True, 10, key="02-interaction-done")
             
\ No newline at end of file
@@ -1,61 +1,524 @@
 import json
+import time
 import asyncio
 from aiohttp import web
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional, Tuple, Union
+from app.client_registry import ClientRegistry
+from app.config import HubConfig, ResumeConfig, RetainedConfig
+from app.frames.codecs import JSON, Codec
 from app.frames.factory import frame
+from app.frames.wire import WireMessage
+from app.hub_bus import HubBus
+from app.journal import OUT, FrameJournal
+from app.log import get_logger, log_frame
+from app.resume import ReplayRing, first_sequence, stamp
+from app.retained import RetainedStore
+from app import metrics
+from app.subscriptions import SubscriptionIndex, validate_pattern
+from app.ws_connection import WsConnection
+
+if TYPE_CHECKING:
+    from app.federation import Federation
+
+log = get_logger("hub")
+
+PRESENCE_MODES = ("immediate", "batched")
 
 class WsHub:
-    def __init__(self, app: web.Application) -> None:
+    def __init__(
+        self,
+        app: web.Application,
+        cfg: Optional[HubConfig] = None,
+        retained: Optional[RetainedConfig] = None,
+        resume: Optional[ResumeConfig] = None,
+    ) -> None:
         self.app = app
-        self._setted_clients: dict = {}
-        self._clients: set[web.WebSocketResponse] = set()
+        self.cfg = cfg or HubConfig()
+        # Last frame of the retained actions, replayed to clients catching up
+        self.retained = RetainedStore(retained)
+        # Session resumption: last sequence stamped on a routed frame, and the
+        # disconnected clients whose ring is kept (id -> (connection, expiry)).
+        # Those stay subscribed, so their ring records the frames they miss,
+        # and stay connected for the others until they expire.
+        self.resume = resume or ResumeConfig()
+        self._seq = first_sequence()
+        self._offline: Dict[str, Tuple[WsConnection, float]] = {}
+        self._offline_handle: Optional[asyncio.TimerHandle] = None
+        self._registry: ClientRegistry[WsConnection] = ClientRegistry()
+        self._clients: dict[web.WebSocketResponse, WsConnection] = {}
+        self._subscriptions: SubscriptionIndex[WsConnection] = SubscriptionIndex()
+        # Immutable view of the connected clients, swapped on membership
+        # changes so the broadcast path reads it without locking or copying.
+        # The lock only serializes writers.
+        self._snapshot: tuple[WsConnection, ...] = ()
         self._lock = asyncio.Lock()
+        # Multi-process mode: bus to the other workers, and the client ids
+        # they own (id -> worker -> connected). An id is connected when any
+        # worker has it: a device back on another worker stays connected
+        # when its stale socket on the previous one times out.
+        self._bus: Optional[HubBus] = None
+        self._remote_clients: Dict[str, Dict[int, bool]] = {}
+        # Federation mode: links to the servers of other rooms, and the
+        # client ids announced by them (id -> connected).
+        self._federation: Optional["Federation"] = None
+        self._federated_clients: Dict[str, bool] = {}
+        # Frame journal: every frame routed or sent by this worker
+        self._journal: Optional[FrameJournal] = None
+
+        # Batched presence: client id -> connected, changes since the last
+        # 00-presence delta
+        if self.cfg.presence_mode not in PRESENCE_MODES:
+            raise ValueError(f"Unknown presence mode: {self.cfg.presence_mode}")
+        self._presence_changes: Dict[str, bool] = {}
+        self._presence_handle: Optional[asyncio.TimerHandle] = None
+
+        for pattern in self.cfg.default_subscriptions:
+            validate_pattern(pattern)
 
     async def set_client(self, id: str, ws: web.WebSocketResponse) -> None:
         async with self._lock:
-            if ws not in self._clients:
+            conn = self._clients.get(ws)
+            if conn is None:
                 return
-            print(f"[WS] New client setted: {id}.")
-            self._setted_clients[id] = ws
+            log.info("New client setted: %s.", id)
+            self._registry.set(id, conn)
+            held = resumed = False
+            if self.resume.enabled:
+                self._expire_offline(time.monotonic())
+                # The others never saw it leave
+                held = id in self._offline
+                resumed = self._resume_session(id, conn)
+
+        if not held:
+            self._publish({"t": "client", "id": id, "c": True})
+            if self._federation is not None:
+                self._federation.announce_client(id, True)
+            if self.cfg.presence_mode == "batched":
+                self._presence_changed(id, True)
+            else:
+                await self.broadcast_action("00-new-client", id)
+        if self.retained.cfg.replay_on == "register" and not resumed:
+            self.replay_retained(conn)
+
+    def _resume_session(self, id: str, conn: WsConnection) -> bool:
+        """
+        Gives the client the replay ring of its id (kept since its last
+        disconnection, or a new one). When it presented its last-seen
+        sequence, queues the frames it missed after a 00-resumed frame, or
+        sends 00-resync when the ring no longer holds all of them (the
+        client then starts over from the retained frames). Returns whether
+        the session was resumed.
+        """
+        ring = conn.ring
+        offline = self._offline.pop(id, None)
+        if offline is not None:
+            ghost = offline[0]
+            self._subscriptions.discard_all(ghost.patterns, ghost)
+            ring = ghost.ring
+        if ring is None:
+            # Frames queued before the registration were not recorded
+            ring = ReplayRing(self.resume.ring_size, self._seq + 1)
+        conn.ring = ring
+
+        last_seq = conn.resume_from
+        if last_seq is None:
+            return False
+        conn.resume_from = None
+
+        if offline is None or not ring.covers(last_seq):
+            reason = "unknown" if offline is None else "evicted"
+            metrics.RESUMES.inc(reason)
+            log.info("Client %s must resync (%s, last seq %d).", id, reason, last_seq)
+            conn.enqueue(json.dumps(frame(
+                sender=self.app["server_id"], action="00-resync", value={"reason": reason, "seq": self._seq}
+            )))
+            return False
 
-        await self.broadcast_action("00-new-client", id)
+        # Later frames were routed to this connection already
+        missed = ring.between(last_seq, conn.added_seq)
+        conn.enqueue(json.dumps(frame(
+            sender=self.app["server_id"], action="00-resumed", value={"replayed": len(missed), "seq": self._seq}
+        )))
+        for message in missed:
+            conn.enqueue(message)
+        metrics.RESUMES.inc("resumed")
+        metrics.RESUME_REPLAYED.inc(amount=len(missed))
+        log.info("Client %s resumed, %d missed frame(s) replayed.", id, len(missed))
+        return True
+
+    def _expire_offline(self, now: float) -> None:
+        """
+        Forgets the rings of the clients that did not come back in time:
+        only then are they announced as disconnected.
+        """
+        # Same TTL for every entry: insertion order is expiry order
+        offline = self._offline
+        expired = False
+        while offline:
+            id, (ghost, expires) = next(iter(offline.items()))
+            if expires > now:
+                break
+            del offline[id]
+            self._subscriptions.discard_all(ghost.patterns, ghost)
+            self._announce_lost(id)
+            expired = True
+        if expired:
+            self._interest_changed()
+        self._schedule_expiry()
+
+    def _schedule_expiry(self) -> None:
+        if self._offline_handle is not None or not self._offline:
+            return
+        _ghost, expires = next(iter(self._offline.values()))
+        self._offline_handle = asyncio.get_running_loop().call_later(
+            max(0.0, expires - time.monotonic()), self._on_expiry
+        )
+
+    def _on_expiry(self) -> None:
+        self._offline_handle = None
+        self._expire_offline(time.monotonic())
+
+    def _announce_lost(self, id: str) -> None:
+        self._publish({"t": "client", "id": id, "c": False})
+        if self._federation is not None:
+            self._federation.announce_client(id, False)
+        if self._remote_connected(id):
+            return
+        if self.cfg.presence_mode == "batched":
+            self._presence_changed(id, False)
+        else:
+            message = json.dumps(frame(sender=self.app["server_id"], action="00-lost-client", value=id))
+            self._broadcast_everywhere(message, "00-lost-client")
+
+    def _resumable(self, conn: WsConnection) -> bool:
+        # Only clients registered with resumption enabled have a ring
+        return self.resume.enabled and conn.ring is not None
 
     async def unset_client(self, ws: web.WebSocketResponse) -> Optional[str]:
         async with self._lock:
-            for id, client in self._setted_clients.items():
-                if client == ws:
-                    self._setted_clients[id] = None
-                    print(f"[WS] client disconnected: {id}.")
-                    return id
-        return None
-
-    async def add(self, ws: web.WebSocketResponse) -> None:
+            conn = self._clients.get(ws)
+            if conn is None:
+                return None
+            id = self._registry.unset(conn)
+            if id is not None:
+                log.info("client disconnected: %s.", id)
+            if id is not None and not self._resumable(conn):
+                # Resumable clients are announced when their ring expires
+                self._publish({"t": "client", "id": id, "c": False})
+                if self._federation is not None:
+                    self._federation.announce_client(id, False)
+            return id
+
+    async def client_id(self, ws: web.WebSocketResponse) -> Optional[str]:
+        conn = self._clients.get(ws)
+        return self._registry.id_of(conn) if conn is not None else None
+
+    async def connected_clients(self) -> Dict[str, bool]:
+        """
+        Every client id registered so far -> whether it is currently connected
+        (on any worker in multi-process mode, on any linked server in
+        federation mode). Clients that may still resume count as connected.
+        """
+        status = self._local_status()
+        for id in self._remote_clients:
+            status[id] = status.get(id, False) or self._remote_connected(id)
+        for id, connected in self._federated_clients.items():
+            status[id] = status.get(id, False) or connected
+        return status
+
+    def _local_status(self) -> Dict[str, bool]:
+        status = self._registry.status()
+        for id in self._offline:
+            status[id] = True
+        return status
+
+    def _remote_connected(self, id: str) -> bool:
+        workers = self._remote_clients.get(id)
+        return workers is not None and any(workers.values())
+
+    def subscribed_patterns(self) -> set[str]:
+        """
+        Action patterns with at least one local subscriber.
+        """
+        return self._subscriptions.patterns()
+
+    def attach_federation(self, federation: "Federation") -> None:
+        self._federation = federation
+
+    def attach_journal(self, journal: FrameJournal) -> None:
+        self._journal = journal
+
+    def _interest_changed(self) -> None:
+        if self._federation is not None:
+            self._federation.interest_changed()
+
+    def set_federated_client(self, id: str, connected: bool) -> None:
+        self._federated_clients[id] = connected
+
+    def deliver_federated_frame(self, message: str, action: Optional[str]) -> int:
+        """
+        A frame forwarded by a linked server: routed to local subscribers
+        (and to the other workers), never forwarded back by the hub itself.
+        """
+        self._publish({"t": "broadcast", "m": message, "a": action})
+        return self._broadcast_local(message, action)
+
+    def deliver_federated_send_to(self, client_ids: Iterable[str], message: str) -> tuple[int, list[str]]:
+        sent, missing = self._send_to_local(client_ids, message)
+        remote = [id for id in missing if self._remote_connected(id)]
+        if remote:
+            self._publish({"t": "send_to", "ids": remote, "m": message})
+            sent += len(remote)
+            missing = [id for id in missing if not self._remote_connected(id)]
+        return sent, missing
+
+    async def attach_bus(self, bus: HubBus) -> None:
+        """
+        Joins the inter-worker bus: broadcasts, unicasts and registry changes
+        are then shared with the clients of every worker.
+        """
+        self._bus = bus
+        await bus.start(self._on_bus_message)
+        self._publish({"t": "hello"})
+
+    async def detach_bus(self) -> None:
+        if self._bus is not None:
+            await self._bus.stop()
+            self._bus = None
+
+    def _publish(self, message: Dict[str, Any]) -> None:
+        if self._bus is not None:
+            self._bus.publish(message)
+
+    async def _on_bus_message(self, message: Dict[str, Any]) -> None:
+        kind = message.get("t")
+        if kind == "broadcast":
+            self._broadcast_local(message["m"], message.get("a"))
+        elif kind == "send_to":
+            self._send_to_local(message["ids"], message["m"])
+        elif kind == "client":
+            self._remote_clients.setdefault(message["id"], {})[message["w"]] = bool(message["c"])
+        elif kind == "hello":
+            # A worker (re)started: it owns no client yet, and learns which
+            # clients live here
+            for workers in self._remote_clients.values():
+                if message["w"] in workers:
+                    workers[message["w"]] = False
+            for id, connected in self._local_status().items():
+                self._publish({"t": "client", "id": id, "c": connected})
+
+    async def add(
+        self,
+        ws: web.WebSocketResponse,
+        patterns: Optional[Iterable[str]] = None,
+        echo: bool = False,
+        batch: bool = False,
+        codec: Codec = JSON,
+        resume_from: Optional[int] = None,
+    ) -> None:
+        """
+        Registers a connection. Without explicit `patterns` the client gets
+        the configured default subscriptions (everything by default).
+        With `batch`, outbound frames are grouped per `batch_window_ms`.
+        `resume_from` is the last sequence the client saw before a
+        reconnection: the gap is replayed when it registers its id.
+        """
+        conn = WsConnection(
+            ws,
+            self.cfg.send_queue_size,
+            self.cfg.slow_consumer_policy,
+            batch_window=self.cfg.batch_window_ms / 1000 if batch else 0.0,
+            batch_max=self.cfg.batch_max_frames,
+            codec=codec,
+        )
+        conn.echo = echo
+        conn.resume_from = resume_from
+        if patterns is None:
+            conn.patterns = set(self.cfg.default_subscriptions)
+        else:
+            conn.patterns = {validate_pattern(p) for p in patterns}
+            conn.default_patterns = False
+
+        conn.start()
         async with self._lock:
-            print("[WS] New client connected.")
-            self._clients.add(ws)
+            log.info("New client connected.")
+            self._clients[ws] = conn
+            self._snapshot = tuple(self._clients.values())
+            conn.added_seq = self._seq
+            for pattern in conn.patterns:
+                self._subscriptions.add(pattern, conn)
+        self._interest_changed()
+        if self.retained.cfg.replay_on == "connect":
+            self.replay_retained(conn)
 
     async def remove(self, ws: web.WebSocketResponse) -> None:
+        conn = self._clients.get(ws)
         client_id = await self.unset_client(ws)
-        print(f"[WS] {client_id}")
-        await self.broadcast_action("00-lost-client", client_id)
+        held = client_id is not None and conn is not None and self._resumable(conn)
+        if held:
+            # May resume: announced as lost when its ring expires
+            pass
+        elif client_id is not None and self._remote_connected(client_id):
+            # Stale socket of a client connected to another worker since
+            pass
+        elif self.cfg.presence_mode == "batched":
+            if client_id is not None:
+                self._presence_changed(client_id, False)
+        else:
+            await self.broadcast_action("00-lost-client", client_id)
 
         async with self._lock:
             if not client_id:
-                print("[WS] client disconnected.")
-            self._clients.discard(ws)
+                log.info("client disconnected.")
+            conn = self._clients.pop(ws, None)
+            if conn is not None:
+                self._snapshot = tuple(self._clients.values())
+                if held:
+                    # Still subscribed until it resumes or expires
+                    now = time.monotonic()
+                    self._offline.pop(client_id, None)
+                    self._offline[client_id] = (conn, now + self.resume.ttl_s)
+                    self._expire_offline(now)
+                else:
+                    self._subscriptions.discard_all(conn.patterns, conn)
 
-    async def count(self) -> int:
+        if conn is not None:
+            self._interest_changed()
+            await conn.stop()
+
+    def _presence_changed(self, id: str, connected: bool) -> None:
+        previous = self._presence_changes.get(id)
+        if previous is None:
+            self._presence_changes[id] = connected
+        elif previous != connected:
+            # Back to the state the others know: nothing to tell
+            del self._presence_changes[id]
+        if self._presence_handle is None:
+            self._presence_handle = asyncio.get_running_loop().call_later(
+                self.cfg.presence_interval_ms / 1000, self._flush_presence
+            )
+
+    def _flush_presence(self) -> None:
+        """
+        Broadcasts the presence changes of the last interval as one
+        00-presence frame: {"connected": [ids], "disconnected": [ids]}.
+        """
+        self._presence_handle = None
+        changes, self._presence_changes = self._presence_changes, {}
+        if not changes:
+            return
+        value = {
+            "connected": [id for id, connected in changes.items() if connected],
+            "disconnected": [id for id, connected in changes.items() if not connected],
+        }
+        message = json.dumps(frame(sender=self.app["server_id"], action="00-presence", value=value))
+        metrics.PRESENCE_DELTAS.inc()
+        self._broadcast_everywhere(message, "00-presence")
+
+    def replay_retained(self, conn: WsConnection) -> int:
+        """
+        Queues the retained frames the client subscribes to (oldest first);
+        batch clients receive them grouped in batch envelopes. Returns the
+        number of frames queued.
+        """
+        if not self.retained.enabled:
+            return 0
+        sent = 0
+        for message in self.retained.snapshot(conn.patterns):
+            if conn.enqueue(message):
+                sent += 1
+        if sent:
+            metrics.RETAINED_REPLAYED.inc(amount=sent)
+            log.debug("%d retained frame(s) replayed.", sent)
+        return sent
+
+    async def subscribe(self, ws: web.WebSocketResponse, patterns: Iterable[str]) -> list[str]:
+        """
+        Adds action patterns to a client. The first explicit subscription
+        replaces the default ones. Returns the client patterns.
+        """
+        patterns = [validate_pattern(p) for p in patterns]
+        async with self._lock:
+            conn = self._clients.get(ws)
+            if conn is None:
+                return []
+            if conn.default_patterns:
+                self._subscriptions.discard_all(conn.patterns, conn)
+                conn.patterns = set()
+                conn.default_patterns = False
+            for pattern in patterns:
+                conn.patterns.add(pattern)
+                self._subscriptions.add(pattern, conn)
+        self._interest_changed()
+        return sorted(conn.patterns)
+
+    async def unsubscribe(self, ws: web.WebSocketResponse, patterns: Iterable[str]) -> list[str]:
+        """
+        Removes action patterns from a client. Returns the client patterns.
+        """
         async with self._lock:
-            return len(self._clients)
+            conn = self._clients.get(ws)
+            if conn is None:
+                return []
+            for pattern in patterns:
+                conn.patterns.discard(pattern)
+                self._subscriptions.discard(pattern, conn)
+            conn.default_patterns = False
+        self._interest_changed()
+        return sorted(conn.patterns)
+
+    async def set_echo(self, ws: web.WebSocketResponse, echo: bool) -> None:
+        conn = self._clients.get(ws)
+        if conn is not None:
+            conn.echo = echo
+
+    async def count(self) -> int:
+        return len(self._snapshot)
+
+    async def wait_for_capacity(self, max_depth: int, timeout: float = 1.0) -> bool:
+        """
+        Waits until every outbound queue holds at most `max_depth` messages:
+        backpressure for bulk producers. Returns False on timeout, clients
+        that stay stalled are left to the slow consumer policy.
+        """
+        deadline = asyncio.get_running_loop().time() + timeout
+        while any(conn.queue_depth > max_depth for conn in self._snapshot):
+            if asyncio.get_running_loop().time() >= deadline:
+                return False
+            await asyncio.sleep(0.005)
+        return True
+
+    def collect_metrics(self) -> None:
+        """
+        Refreshes the gauges read at scrape time (the counters and
+        histograms are updated on the hot paths).
+        """
+        clients = self._snapshot
+        depths = [conn.queue_depth for conn in clients]
+        metrics.CONNECTIONS.set(len(clients))
+        metrics.REGISTERED_CLIENTS.set(sum(self._registry.status().values()))
+        metrics.SEND_QUEUE_DEPTH.set(sum(depths), "total")
+        metrics.SEND_QUEUE_DEPTH.set(max(depths, default=0), "max")
+        metrics.RETAINED_ENTRIES.set(len(self.retained))
+        self._expire_offline(time.monotonic())
+        metrics.RESUME_OFFLINE.set(len(self._offline))
         
     async def send_json(self, ws: web.WebSocketResponse, obj: dict) -> None:
         message = json.dumps(obj, ensure_ascii=False)
         await self.send_message(ws, message)
     
     async def send_message(self, ws: web.WebSocketResponse, message: str, can_print: bool = True) -> None:
-        await ws.send_str(message)
+        # Go through the client queue when there is one, to keep ordering
+        # with broadcasts; sockets not registered in the hub are written directly.
+        conn = self._clients.get(ws)
+        if conn is not None:
+            conn.enqueue(message)
+        else:
+            await ws.send_str(message)
+        if self._journal is not None:
+            self._journal.record(OUT, message)
         if can_print:
-            print(f"> {message}")
+            log_frame(">", None, message)
 
     async def send_action(self, ws: web.WebSocketResponse, action: str, value) -> None:
         message = json.dumps(frame(
@@ -65,37 +528,168 @@ class WsHub:
         ))
         await self.send_message(ws, message)
 
+    async def send_to(self, client_ids: Union[str, Iterable[str]], message: str) -> int:
+        """
+        Unicast (one id) or multicast (several ids) to registered clients,
+        without going through a broadcast. Unknown or disconnected ids are
+        skipped. Returns the number of clients the message was queued for.
+        """
+        if isinstance(client_ids, str):
+            client_ids = (client_ids,)
+
+        sent, missing = self._send_to_local(client_ids, message)
+
+        # Clients connected to another worker
+        remote = [id for id in missing if self._remote_connected(id)]
+        if remote:
+            self._publish({"t": "send_to", "ids": remote, "m": message})
+            sent += len(remote)
+
+        # Clients connected to a linked server
+        if self._federation is not None and len(remote) < len(missing):
+            sent += self._federation.forward_send_to(
+                [id for id in missing if not self._remote_connected(id)], message
+            )
+
+        return sent
+
+    def _send_to_local(self, client_ids: Iterable[str], message: str) -> tuple[int, list[str]]:
+        clients = set()
+        missing = []
+        for id in client_ids:
+            conn = self._registry.get(id)
+            if conn is None:
+                missing.append(id)
+                # Disconnected client whose ring is kept: recorded for its resumption
+                offline = self._offline.get(id)
+                if offline is not None:
+                    clients.add(offline[0])
+            else:
+                clients.add(conn)
+
+        metrics.BROADCASTS.inc("send_to")
+        if not clients:
+            if self._journal is not None:
+                self._journal.record(OUT, message)
+            return 0, missing
+
+        sent = 0
+        if self.resume.enabled:
+            self._seq += 1
+            seq = self._seq
+            wire = WireMessage(stamp(message, seq))
+            for conn in clients:
+                if conn.ring is not None:
+                    conn.ring.append(seq, wire)
+                if conn.enqueue(wire):
+                    sent += 1
+        else:
+            wire = WireMessage(message)
+            for conn in clients:
+                if conn.enqueue(wire):
+                    sent += 1
+        if self._journal is not None:
+            self._journal.record(OUT, wire.text)
+
+        if sent:
+            log_frame(">", None, message)
+
+        return sent, missing
+
+    async def send_action_to(self, client_ids: Union[str, Iterable[str]], action: str, value) -> int:
+        message = json.dumps(frame(
+            sender=self.app["server_id"],
+            action=action,
+            value=value
+        ))
+        return await self.send_to(client_ids, message)
+
     async def broadcast_action(self, action: str, value) -> int:
         message = json.dumps(frame(
             sender=self.app["server_id"],
             action=action,
             value=value
         ))
-        return await self.broadcast(message)
+        return await self.broadcast(message, action=action)
 
-    async def broadcast(self, message: str) -> int:
-        async with self._lock:
-            clients = list(self._clients)
+    async def broadcast(
+        self,
+        message: str,
+        action: Optional[str] = None,
+        sender: Optional[web.WebSocketResponse] = None,
+    ) -> int:
+        """
+        Enqueues the message on client queues without waiting for delivery.
+        The WebSocket frame is encoded once and shared by all clients.
+
+        - action: only clients subscribed to it receive the message
+                  (None sends to every client)
+        - sender: skipped, unless it opted in to echo
+
+        Returns the number of clients of this worker the message was queued for.
+        """
+        return self._broadcast_everywhere(message, action, sender)
 
+    def _broadcast_everywhere(
+        self,
+        message: str,
+        action: Optional[str] = None,
+        sender: Optional[web.WebSocketResponse] = None,
+    ) -> int:
+        # Other workers, linked servers, then the clients of this worker
+        self._publish({"t": "broadcast", "m": message, "a": action})
+        if self._federation is not None:
+            self._federation.forward_frame(message, action)
+        return self._broadcast_local(message, action, sender)
+
+    def _broadcast_local(
+        self,
+        message: str,
+        action: Optional[str] = None,
+        sender: Optional[web.WebSocketResponse] = None,
+    ) -> int:
+        if action is None:
+            clients = self._snapshot
+        else:
+            self.retained.update(message, action)
+            clients = self._subscriptions.match(action)
+
+        metrics.BROADCASTS.inc("broadcast")
         if not clients:
+            metrics.BROADCAST_FANOUT.observe(0)
+            # Routed to nobody: still journaled (without a sequence)
+            if self._journal is not None:
+                self._journal.record(OUT, message)
             return 0
 
-        dead: list[web.WebSocketResponse] = []
+        # Sequence stamped once per routed frame (per worker), not per
+        # client, so the frame is still encoded once for every client. Each
+        # ring records the sequences queued for its client: the hub computes
+        # the gap, clients only ever send back their last value.
         sent = 0
+        if self.resume.enabled:
+            self._seq += 1
+            seq = self._seq
+            wire = WireMessage(stamp(message, seq))
+            for conn in clients:
+                if conn.ws is sender and not conn.echo:
+                    continue
+                if conn.ring is not None:
+                    conn.ring.append(seq, wire)
+                if conn.enqueue(wire):
+                    sent += 1
+        else:
+            wire = WireMessage(message)
+            for conn in clients:
+                if conn.ws is sender and not conn.echo:
+                    continue
+                if conn.enqueue(wire):
+                    sent += 1
 
-        for ws in clients:
-            if ws.closed:
-                dead.append(ws)
-                continue
-            try:
-                await self.send_message(ws, message, sent == 0)
-                sent += 1
-            except Exception:
-                dead.append(ws)
-
-        if dead:
-            async with self._lock:
-                for ws in dead:
-                    self._clients.discard(ws)
+        metrics.BROADCAST_FANOUT.observe(sent)
+        if self._journal is not None:
+            self._journal.record(OUT, wire.text)
+        if sent:
+            log_frame(">", action, message)
 
-        return sent
\ No newline at end of file
+        return sent
@@ -1,17 +1,136 @@
 from __future__ import annotations
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
 from aiohttp import web
 
 from app.import_utils import import_symbol
 from app.frames.frame import Frame
 from app.config import AppConfig
+from app.log import get_logger
+from app.schemas import Validator, compile_schema
+from app.subscriptions import validate_pattern
 from app.ws_controllers.base import WsController
+from app.metrics import HANDLER_DURATION, HANDLER_ERRORS, HANDLER_TIMEOUTS
+
+log = get_logger("controllers")
+
+# expected signature:
+# async def handler(self, frame: Frame, ws: web.WebSocketResponse) -> None
+Handler = Callable[[Frame, web.WebSocketResponse], Awaitable[None]]
+
+T = TypeVar("T")
+
+# Resolved actions are cached; past this many distinct actions (garbage
+# from a misbehaving device) lookups go through the trie without caching.
+MAX_CACHED_ACTIONS = 4096
+
+
+class _TrieNode(Generic[T]):
+    __slots__ = ("children", "exact", "prefix")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _TrieNode[T]] = {}
+        self.exact: List[T] = []    # items of the pattern ending here
+        self.prefix: List[T] = []   # items of the pattern `<path>*`
+
+
+class ActionTrie(Generic[T]):
+    """
+    Action patterns (exact, `prefix*` or `*`) -> items, in a character trie.
+
+    `match` returns the items of every matching pattern: exact ones first,
+    then prefixes from the longest to the shortest (`*` last), each in
+    insertion order.
+    """
+
+    def __init__(self) -> None:
+        self._root: _TrieNode[T] = _TrieNode()
+
+    def add(self, pattern: str, item: T) -> None:
+        wildcard = pattern.endswith("*")
+        node = self._root
+        for char in pattern[:-1] if wildcard else pattern:
+            node = node.children.setdefault(char, _TrieNode())
+        (node.prefix if wildcard else node.exact).append(item)
+
+    def match(self, action: str) -> List[T]:
+        node = self._root
+        prefixes = [node.prefix]
+        for char in action:
+            node = node.children.get(char)
+            if node is None:
+                break
+            prefixes.append(node.prefix)
+
+        items = list(node.exact) if node is not None else []
+        for found in reversed(prefixes):
+            items.extend(found)
+        return items
+
+
+class _Route:
+    __slots__ = ("pattern", "handler", "validate")
+
+    def __init__(self, pattern: str, handler: Handler, validate: Optional[Validator]) -> None:
+        self.pattern = pattern
+        self.handler = handler
+        self.validate = validate
+
+
+class HandlerWatch:
+    """
+    Progress of one dispatch, for a watchdog enforcing handler timeouts:
+    `started` is the time.monotonic() start of the running handler (None
+    between handlers). The watchdog sets `timed_out` before cancelling the
+    task, the dispatch then goes on with the next handler.
+    """
+
+    __slots__ = ("started", "timed_out")
+
+    def __init__(self) -> None:
+        self.started: Optional[float] = None
+        self.timed_out = False
 
 
 class WsActionDispatcher:
+    """
+    Every controller of `ws_actions` is imported, instantiated (one per
+    class) and its handlers bound at startup: config errors fail before the
+    server starts. Routes may be exact actions or patterns (`01-*`, `*`),
+    and an action may have several handlers (a list in config).
+
+    Frames then cost one table lookup and the handler calls.
+    """
+
     def __init__(self, app: web.Application, cfg: AppConfig):
         self.app = app
         self.cfg = cfg
         self._controller_cache: dict[str, WsController] = {}
+        self._trie: ActionTrie[_Route] = ActionTrie()
+        # action -> (handlers, value validator)
+        self._table: Dict[str, Tuple[Tuple[Handler, ...], Optional[Validator]]] = {}
+
+        for pattern, routes in cfg.ws_actions.items():
+            try:
+                validate_pattern(pattern)
+            except ValueError as e:
+                raise RuntimeError(f"ws_actions: {e}")
+            for route in routes:
+                controller = self._get_controller(route.controller)
+                handler = getattr(controller, route.action, None)
+                if not callable(handler):
+                    raise RuntimeError(
+                        f"WS Controller '{route.controller}' has no method '{route.action}' "
+                        f"for action '{pattern}'"
+                    )
+                validate = None
+                if route.schema is not None:
+                    try:
+                        validate = compile_schema(route.schema)
+                    except ValueError as e:
+                        raise RuntimeError(f"ws_actions['{pattern}']: {e}")
+                self._trie.add(pattern, _Route(pattern, handler, validate))
 
     def _get_controller(self, import_path: str) -> WsController:
         if import_path not in self._controller_cache:
@@ -19,24 +138,85 @@ class WsActionDispatcher:
             self._controller_cache[import_path] = ControllerClass(self.app)
         return self._controller_cache[import_path]
 
-    async def dispatch(self, frame: Frame, ws: web.WebSocketResponse) -> bool:
+    def _resolve(self, action: str) -> Tuple[Tuple[Handler, ...], Optional[Validator]]:
+        entry = self._table.get(action)
+        if entry is not None:
+            return entry
+
+        routes = self._trie.match(action)
+        handlers = tuple(route.handler for route in routes)
+        validators = [route.validate for route in routes if route.validate is not None]
+        entry = (handlers, _all_of(validators))
+        if len(self._table) < MAX_CACHED_ACTIONS:
+            self._table[action] = entry
+        return entry
+
+    def handles(self, action: str) -> bool:
+        return bool(self._resolve(action)[0])
+
+    def validate(self, frame: Frame) -> Optional[str]:
+        """
+        Checks the frame value against the schemas of its routes. Returns
+        an error message, or None when the value is valid.
+        """
+        validate = self._resolve(frame.action)[1]
+        return validate(frame.value) if validate is not None else None
+
+    async def dispatch(
+        self,
+        frame: Frame,
+        ws: web.WebSocketResponse,
+        received_at: Optional[float] = None,
+        watch: Optional[HandlerWatch] = None,
+    ) -> bool:
         """
         Returns True if a handler was called, False otherwise.
+        `received_at` (time.time() of arrival) feeds the hub -> handler latency.
+
+        Every handler of the action runs, in order; a handler error, or a
+        timeout reported through `watch`, is logged and does not prevent
+        the next ones.
         """
-        route = self.cfg.ws_actions.get(frame.action)
-        if route is None:
+        handlers = self._resolve(frame.action)[0]
+        if not handlers:
             return False
 
-        controller = self._get_controller(route.controller)
+        if received_at is not None:
+            self.app["latency"].handler_started(frame.action, received_at)
+        start = time.perf_counter()
+        try:
+            for handler in handlers:
+                if watch is not None:
+                    watch.started = time.monotonic()
+                try:
+                    await handler(frame, ws)
+                except asyncio.CancelledError:
+                    if watch is None or not watch.timed_out:
+                        raise
+                    watch.timed_out = False
+                    asyncio.current_task().uncancel()
+                    log.warning("Handler timed out for action=%s", frame.action)
+                    HANDLER_TIMEOUTS.inc(frame.action)
+                except Exception as e:
+                    log.exception("Handler error for action=%s: %s", frame.action, e)
+                    HANDLER_ERRORS.inc(frame.action)
+        finally:
+            if watch is not None:
+                watch.started = None
+            HANDLER_DURATION.observe(time.perf_counter() - start, frame.action)
+        return True
+
 
-        if not hasattr(controller, route.action):
-            raise RuntimeError(
-                f"WS Controller '{route.controller}' has no method '{route.action}' "
-                f"for incoming action '{frame.action}'"
-            )
+def _all_of(validators: List[Validator]) -> Optional[Validator]:
+    if not validators:
+        return None
+    if len(validators) == 1:
+        return validators[0]
 
-        handler = getattr(controller, route.action)
-        # expected signature:
-        # async def handler(self, frame: Frame, ws: web.WebSocketResponse) -> None
-        await handler(frame, ws)
-        return True
\ No newline at end of file
+    def validate(value: Any) -> Optional[str]:
+        for check in validators:
+            error = check(value)
+            if error:
+                return error
+        return None
+    return validate
@@ -0,0 +1,186 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, Optional, Set
+
+from aiohttp import web
+
+from app.config import DispatchConfig
+from app.frames.frame import Frame
+from app.log import get_logger
+from app.metrics import HANDLER_JOBS_DROPPED, HANDLER_JOBS_PENDING
+from app.ws_router import HandlerWatch, WsActionDispatcher
+
+log = get_logger("controllers")
+
+ORDERINGS = ("connection", "action", "concurrent")
+
+
+class _Job(HandlerWatch):
+    __slots__ = ("frame", "ws", "received_at", "task")
+
+    def __init__(self, frame: Frame, ws: Optional[web.WebSocketResponse], received_at: Optional[float]) -> None:
+        super().__init__()
+        self.task: Optional[asyncio.Task] = None
+        self.frame = frame
+        self.ws = ws
+        self.received_at = received_at
+
+
+class HandlerRunner:
+    """
+    Runs WS action handlers as tasks, so the read loop of a connection is
+    never blocked by controller code.
+
+    The ordering decides which frames are handled one after the other:
+      - connection: the frames of one connection, in arrival order
+      - action:     the frames of one action, whatever the connection
+      - concurrent: none, every frame gets its own task
+
+    At most `max_concurrency` frames are handled at the same time and at
+    most `max_pending` wait or run: beyond that new frames are not handled
+    (they are still routed). When a connection closes, its handlers still
+    running or waiting are cancelled.
+
+    Handler timeouts are enforced by one watchdog task checking the running
+    frames every second (a tenth of the timeout if shorter), not by a timer
+    per call: a handler is cancelled between `handler_timeout_s` and one
+    check interval later.
+    """
+
+    def __init__(self, dispatcher: WsActionDispatcher, cfg: DispatchConfig) -> None:
+        if cfg.ordering not in ORDERINGS:
+            raise ValueError(f"Unknown dispatch ordering: {cfg.ordering}")
+
+        self.dispatcher = dispatcher
+        self.cfg = cfg
+        self._semaphore = asyncio.Semaphore(max(1, cfg.max_concurrency))
+        # Ordered modes: lane key (connection or action) -> waiting jobs, drained by one worker each
+        self._lanes: Dict[Hashable, Deque[_Job]] = {}
+        self._workers: Dict[Hashable, asyncio.Task] = {}
+        # Handler tasks per connection (None: frames without connection)
+        self._tasks: Dict[Any, Set[asyncio.Task]] = {}
+        self._pending = 0
+        # Jobs whose handlers run, checked by the watchdog
+        self._running: Set[_Job] = set()
+        self._watchdog: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def submit(self, frame: Frame, ws: Optional[web.WebSocketResponse], received_at: Optional[float] = None) -> bool:
+        """
+        Schedules the handlers of the frame without waiting for them.
+        Returns True if the frame will be handled, False when its action has
+        no handler or the pending limit is reached.
+        """
+        if not self.dispatcher.handles(frame.action):
+            return False
+        if self._pending >= self.cfg.max_pending:
+            log.warning("Handler queue full (%d pending), frame not handled: %s", self._pending, frame.action)
+            HANDLER_JOBS_DROPPED.inc(frame.action)
+            return False
+
+        self._pending += 1
+        job = _Job(frame, ws, received_at)
+        if self.cfg.ordering == "concurrent":
+            self._start(job)
+            return True
+
+        key = ws if self.cfg.ordering == "connection" else frame.action
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = deque()
+            self._workers[key] = asyncio.create_task(self._drain(key, lane))
+        lane.append(job)
+        return True
+
+    def connection_closed(self, ws: web.WebSocketResponse) -> None:
+        """
+        Cancels the handlers of a closed connection (running and waiting).
+        """
+        if not self.cfg.cancel_on_disconnect:
+            return
+        for task in self._tasks.pop(ws, ()):
+            task.cancel()
+        if self.cfg.ordering == "connection":
+            lane = self._lanes.pop(ws, None)
+            worker = self._workers.pop(ws, None)
+            if lane:
+                self._pending -= len(lane)
+            if worker is not None:
+                worker.cancel()
+        # Action lanes skip the jobs of closed connections when they reach them
+
+    async def close(self) -> None:
+        """
+        Cancels every worker and handler task, then waits for them.
+        """
+        tasks = list(self._workers.values())
+        if self._watchdog is not None:
+            tasks.append(self._watchdog)
+            self._watchdog = None
+        for owned in self._tasks.values():
+            tasks.extend(owned)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._lanes.clear()
+        self._workers.clear()
+        self._tasks.clear()
+        self._pending = 0
+
+    def collect_metrics(self) -> None:
+        HANDLER_JOBS_PENDING.set(self._pending)
+
+    def _start(self, job: _Job) -> asyncio.Task:
+        task = job.task = asyncio.create_task(self._run(job))
+        owned = self._tasks.setdefault(job.ws, set())
+        owned.add(task)
+
+        def done(task: asyncio.Task) -> None:
+            # In a callback, not in _run: a task cancelled before its first
+            # step never runs its body
+            self._pending -= 1
+            self._running.discard(job)
+            owned.discard(task)
+            if not owned and self._tasks.get(job.ws) is owned:
+                del self._tasks[job.ws]
+        task.add_done_callback(done)
+        return task
+
+    async def _run(self, job: _Job) -> None:
+        async with self._semaphore:
+            if self.cfg.handler_timeout_s <= 0:
+                await self.dispatcher.dispatch(job.frame, job.ws, job.received_at)
+                return
+            if self._watchdog is None:
+                self._watchdog = asyncio.create_task(self._watch(self.cfg.handler_timeout_s))
+            self._running.add(job)
+            await self.dispatcher.dispatch(job.frame, job.ws, job.received_at, job)
+
+    async def _watch(self, timeout: float) -> None:
+        interval = min(1.0, timeout / 10)
+        while True:
+            await asyncio.sleep(interval)
+            deadline = time.monotonic() - timeout
+            for job in self._running:
+                if job.started is not None and job.started <= deadline and not job.timed_out:
+                    job.timed_out = True
+                    job.task.cancel()
+
+    async def _drain(self, key: Hashable, lane: Deque[_Job]) -> None:
+        try:
+            while lane:
+                job = lane.popleft()
+                if self.cfg.cancel_on_disconnect and job.ws is not None and job.ws.closed:
+                    self._pending -= 1
+                    continue
+                # wait() does not raise when the handler task is cancelled
+                await asyncio.wait((self._start(job),))
+        finally:
+            if self._lanes.get(key) is lane:
+                self._pending -= len(lane)
+                del self._lanes[key]
+                del self._workers[key]
@@ -0,0 +1 @@
+__all__ = ["broadcast_encode", "broadcast_snapshot", "suite"]
\ No newline at end of file
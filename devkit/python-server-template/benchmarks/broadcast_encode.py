@@ -0,0 +1,90 @@
+"""
+CPU cost of one broadcast versus client count.
+
+Compares the per-client `send_str` path (UTF-8 encode + frame header for
+every client) with the encode-once `WireMessage` path used by WsHub.
+
+Run from the server template folder:
+  python -m benchmarks.broadcast_encode
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, List
+
+from aiohttp import WSMsgType
+from aiohttp._websocket.writer import WebSocketWriter
+
+from app.frames.factory import frame
+from app.frames.wire import WireMessage
+from app.ws_connection import WsConnection
+
+CLIENT_COUNTS = [1, 10, 100, 1000]
+ROUNDS = 200
+
+
+class FakeTransport:
+    def __init__(self) -> None:
+        self.written = 0
+
+    def write(self, data: bytes) -> None:
+        self.written += len(data)
+
+    def is_closing(self) -> bool:
+        return False
+
+
+class FakeProtocol:
+    writing_paused = False
+    _paused = False
+
+    async def _drain_helper(self) -> None:
+        pass
+
+
+class FakeWs:
+    """
+    Minimal stand-in for web.WebSocketResponse backed by a real aiohttp writer.
+    """
+
+    closed = False
+
+    def __init__(self) -> None:
+        self._writer = WebSocketWriter(FakeProtocol(), FakeTransport())
+
+    async def send_str(self, data: str) -> None:
+        await self._writer.send_frame(data.encode("utf-8"), WSMsgType.TEXT)
+
+
+def build_message() -> str:
+    return json.dumps(frame(
+        sender="ESP32-010101",
+        action="01-wind-toggle",
+        value={"speed": 3, "label": "brise légère", "samples": list(range(32))},
+    ), ensure_ascii=False)
+
+
+async def run_case(conns: List[WsConnection], message: Any, encode_once: bool) -> float:
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        item = WireMessage(message) if encode_once else message
+        for conn in conns:
+            await conn.deliver(item)
+    return (time.process_time() - start) / ROUNDS
+
+
+async def main() -> None:
+    message = build_message()
+    print(f"payload: {len(message.encode('utf-8'))} bytes, {ROUNDS} broadcasts per case")
+    print(f"{'clients':>8} {'send_str us':>12} {'encode-once us':>15} {'speedup':>8}")
+
+    for count in CLIENT_COUNTS:
+        conns = [WsConnection(FakeWs(), 1, "drop_oldest") for _ in range(count)]
+        per_client = await run_case(conns, message, encode_once=False)
+        once = await run_case(conns, message, encode_once=True)
+        print(f"{count:>8} {per_client * 1e6:>12.1f} {once * 1e6:>15.1f} {per_client / once:>7.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+"""
+Cost of reading the client list on the broadcast path.
+
+Compares the former lock-and-copy access (`async with lock: list(clients)`)
+with the copy-on-write snapshot read by WsHub.broadcast, then measures a
+full WsHub.broadcast on top of it.
+
+Run from the server template folder:
+  python -m benchmarks.broadcast_snapshot
+"""
+
+import asyncio
+import time
+
+from app.frames.wire import WireMessage
+from app.ws_hub import WsHub
+
+CLIENT_COUNTS = [10, 100, 1000]
+ROUNDS = 20000
+
+
+class FakeConnection:
+    def __init__(self) -> None:
+        self.ws = object()
+        self.echo = False
+
+    def enqueue(self, message: WireMessage) -> bool:
+        return True
+
+
+async def lock_and_copy(lock: asyncio.Lock, clients: dict) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        async with lock:
+            snapshot = list(clients.values())
+        for _conn in snapshot:
+            pass
+    return (time.perf_counter() - start) / ROUNDS
+
+
+async def snapshot_read(hub: WsHub) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        snapshot = hub._snapshot
+        for _conn in snapshot:
+            pass
+    return (time.perf_counter() - start) / ROUNDS
+
+
+async def full_broadcast(hub: WsHub, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await hub.broadcast("{}")
+    return (time.perf_counter() - start) / rounds
+
+
+async def main() -> None:
+    print(f"{'clients':>8} {'lock+copy us':>13} {'snapshot us':>12} {'speedup':>8} {'broadcast us':>13}")
+
+    for count in CLIENT_COUNTS:
+        conns = {object(): FakeConnection() for _ in range(count)}
+
+        hub = WsHub(app={})
+        hub._clients = conns
+        hub._snapshot = tuple(conns.values())
+
+        copied = await lock_and_copy(asyncio.Lock(), conns)
+        read = await snapshot_read(hub)
+        broadcast = await full_broadcast(hub, max(100, ROUNDS // count))
+        print(f"{count:>8} {copied * 1e6:>13.2f} {read * 1e6:>12.2f} {copied / read:>7.2f}x {broadcast * 1e6:>13.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,275 @@
+"""
+Microbenchmarks of the frame hot paths, compared to stored baselines.
+
+Each case is timed over several repeats (best one kept, after a warm-up)
+and compared to `baseline.json`. The run fails (exit code 1) when a case
+is slower than its baseline by more than the threshold (25% by default,
+overridable per case in the baseline file).
+
+Baselines are machine specific: record them on the machine used for the
+comparisons.
+
+Run from the server template folder:
+  python -m benchmarks.suite                 # compare to the baseline
+  python -m benchmarks.suite --save          # record a new baseline
+  python -m benchmarks.suite --only frame_parse,hub_broadcast_100
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+from app.config import AppConfig, JournalConfig, ServerConfig, WsActionConfig
+from app.frames.factory import frame
+from app.frames.parser import FrameParser
+from app.journal import FrameJournal
+from app.ws_controllers.base import WsController
+from app.ws_hub import WsHub
+from app.ws_router import WsActionDispatcher
+from benchmarks.broadcast_encode import FakeWs
+
+BASELINE = Path(__file__).with_name("baseline.json")
+ESP32_APP = Path(__file__).resolve().parents[2] / "python-esp32-template" / "app"
+DEFAULT_THRESHOLD = 0.25
+# Long repeats and a warm-up: short ones let frequency scaling and other
+# processes move unchanged cases past the threshold between runs
+REPEAT = 7
+MIN_TIME = 0.2  # seconds per repeat
+
+# A case is built once, then called with a number of operations and
+# returns the elapsed time for them.
+Case = Callable[[int], Awaitable[float]]
+
+RAW_FRAME = json.dumps(frame(
+    sender="ESP32-010101",
+    action="01-wind-toggle",
+    value={"speed": 3, "label": "brise légère", "samples": list(range(16))},
+), ensure_ascii=False)
+
+
+class BenchController(WsController):
+    async def on_bench(self, frame, ws) -> None:
+        pass
+
+
+def case_frame_parse() -> Case:
+    async def run(n: int) -> float:
+        start = time.perf_counter()
+        for _ in range(n):
+            FrameParser(RAW_FRAME).parse()
+        return time.perf_counter() - start
+    return run
+
+
+def case_frame_parse_batch16() -> Case:
+    raw = "[" + ",".join([RAW_FRAME] * 16) + "]"
+
+    async def run(n: int) -> float:
+        start = time.perf_counter()
+        for _ in range(n):
+            FrameParser(raw).parse_all()
+        return time.perf_counter() - start
+    return run
+
+
+def case_factory_frame() -> Case:
+    async def run(n: int) -> float:
+        start = time.perf_counter()
+        for _ in range(n):
+            frame(sender="SERVER-000000", action="00-new-client", value="ESP32-010101")
+        return time.perf_counter() - start
+    return run
+
+
+def case_dispatch() -> Case:
+    cfg = AppConfig(
+        server=ServerConfig(id="SERVER-000000", host="127.0.0.1", port=0, ws_path="/ws"),
+        routes=[],
+        ws_actions={"bench": [WsActionConfig(controller="benchmarks.suite.BenchController", action="on_bench")]},
+    )
+    dispatcher = WsActionDispatcher(web.Application(), cfg)
+    parsed = FrameParser(RAW_FRAME.replace("01-wind-toggle", "bench")).parse()
+
+    async def run(n: int) -> float:
+        start = time.perf_counter()
+        for _ in range(n):
+            await dispatcher.dispatch(parsed, None)
+        return time.perf_counter() - start
+    return run
+
+
+def case_hub_broadcast(clients: int, journal: bool = False) -> Callable[[], Case]:
+    def build() -> Case:
+        state: Dict[str, Any] = {}
+
+        async def run(n: int) -> float:
+            # Built lazily: connection writer tasks need the running loop
+            if "hub" not in state:
+                hub = WsHub(web.Application())
+                for _ in range(clients):
+                    await hub.add(FakeWs())
+                if journal:
+                    state["dir"] = tempfile.TemporaryDirectory()
+                    frame_journal = FrameJournal(JournalConfig(enabled=True), state["dir"].name)
+                    await frame_journal.start()
+                    hub.attach_journal(frame_journal)
+                state["hub"] = hub
+            hub = state["hub"]
+            start = time.perf_counter()
+            for _ in range(n):
+                await hub.broadcast(RAW_FRAME, action="01-wind-toggle")
+                # Let every connection writer deliver to its fake socket
+                await asyncio.sleep(0)
+            return time.perf_counter() - start
+        return run
+    return build
+
+
+def case_esp32_parse() -> Optional[Case]:
+    if not ESP32_APP.is_dir():
+        return None
+    if str(ESP32_APP) not in sys.path:
+        sys.path.append(str(ESP32_APP))
+    from framework.utils.frames.frame_parser import FrameParser as Esp32FrameParser
+
+    async def run(n: int) -> float:
+        start = time.perf_counter()
+        for _ in range(n):
+            Esp32FrameParser(RAW_FRAME).parse()
+        return time.perf_counter() - start
+    return run
+
+
+def case_esp32_to_json() -> Optional[Case]:
+    if not ESP32_APP.is_dir():
+        return None
+    if str(ESP32_APP) not in sys.path:
+        sys.path.append(str(ESP32_APP))
+    from framework.utils.frames.frame_parser import FrameParser as Esp32FrameParser
+    parsed = Esp32FrameParser(RAW_FRAME).parse()
+
+    async def run(n: int) -> float:
+        start = time.perf_counter()
+        for _ in range(n):
+            parsed.to_json()
+        return time.perf_counter() - start
+    return run
+
+
+CASES: Dict[str, Callable[[], Optional[Case]]] = {
+    "frame_parse": case_frame_parse,
+    "frame_parse_batch16": case_frame_parse_batch16,
+    "factory_frame": case_factory_frame,
+    "dispatch": case_dispatch,
+    "hub_broadcast_10": case_hub_broadcast(10),
+    "hub_broadcast_100": case_hub_broadcast(100),
+    "hub_broadcast_journal": case_hub_broadcast(100, journal=True),
+    "esp32_frame_parse": case_esp32_parse,
+    "esp32_frame_to_json": case_esp32_to_json,
+}
+
+
+async def measure(case: Case) -> float:
+    """
+    Seconds per operation: the number of operations is doubled until one
+    repeat lasts MIN_TIME, then after a warm-up repeat the best of REPEAT
+    repeats is kept.
+    """
+    n = 1
+    while await case(n) < MIN_TIME:
+        n *= 2
+    await case(n)
+    return min([await case(n) for _ in range(REPEAT)]) / n
+
+
+async def cancel_leftovers() -> None:
+    """
+    Stops the tasks a case left running (connection writers).
+    """
+    tasks = asyncio.all_tasks() - {asyncio.current_task()}
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def load_baseline(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {"results": {}, "thresholds": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path: Path, results: Dict[str, float], previous: Dict[str, Any]) -> None:
+    data = {
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} {platform.processor()}".strip(),
+        "results": {**previous.get("results", {}), **results},
+        "thresholds": previous.get("thresholds", {}),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+async def main() -> int:
+    p = argparse.ArgumentParser(description="Frame hot path microbenchmarks")
+    p.add_argument("--save", action="store_true", help="Record the results as the new baseline")
+    p.add_argument("--baseline", default=str(BASELINE), help="Baseline file")
+    p.add_argument("--threshold", type=float, default=None,
+                   help=f"Allowed slowdown ratio (default: per case from the baseline, else {DEFAULT_THRESHOLD})")
+    p.add_argument("--only", default="", help="Comma-separated case names")
+    args = p.parse_args()
+
+    names: List[str] = [n.strip() for n in args.only.split(",") if n.strip()] or list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        p.error(f"unknown case(s): {', '.join(unknown)} (available: {', '.join(CASES)})")
+
+    baseline = load_baseline(Path(args.baseline))
+    results: Dict[str, float] = {}
+    regressions: List[str] = []
+
+    print(f"{'case':<22} {'us/op':>10} {'baseline':>10} {'change':>8}")
+    for name in names:
+        case = CASES[name]()
+        if case is None:
+            print(f"{name:<22} {'skipped':>10}")
+            continue
+        per_op = await measure(case)
+        results[name] = per_op
+        await cancel_leftovers()
+
+        reference = baseline["results"].get(name)
+        if reference is None:
+            print(f"{name:<22} {per_op * 1e6:>10.2f} {'-':>10} {'-':>8}")
+            continue
+        change = per_op / reference - 1
+        threshold = args.threshold if args.threshold is not None else \
+            baseline.get("thresholds", {}).get(name, DEFAULT_THRESHOLD)
+        status = ""
+        if change > threshold:
+            status = f"  REGRESSION (> {threshold:+.0%})"
+            regressions.append(name)
+        print(f"{name:<22} {per_op * 1e6:>10.2f} {reference * 1e6:>10.2f} {change:>+8.1%}{status}")
+
+    if args.save:
+        save_baseline(Path(args.baseline), results, baseline)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
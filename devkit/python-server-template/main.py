@@ -1,13 +1,106 @@
+import argparse
+import multiprocessing
+import multiprocessing.connection
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from typing import Dict, Optional
 from aiohttp import web
 from app.config import load_config
+from app.hub_bus import HubBus
+from app.log import setup_logging
 from app.server import build_app
 
+# Seconds before restarting a worker that died, so a crash loop does not spin
+RESPAWN_DELAY_S = 1.0
+
+
+def run_worker(config_path: str, worker_id: int = 0, workers: int = 1, bus_dir: Optional[str] = None) -> None:
+    cfg = load_config(config_path)
+    listener = setup_logging(cfg.logging)
+    bus = HubBus(bus_dir, worker_id, workers) if workers > 1 else None
+    app = build_app(cfg, bus)
+    try:
+        web.run_app(
+            app,
+            host=cfg.server.host,
+            port=cfg.server.port,
+            reuse_port=workers > 1,
+            print=print if worker_id == 0 else None,
+        )
+    finally:
+        listener.stop()
+
+
+def run_workers(config_path: str, workers: int) -> None:
+    """
+    Forks `workers` processes sharing the listening port (SO_REUSEPORT).
+    Their hubs are linked by a bus of Unix sockets in a temporary folder.
+    A worker that dies is started again under the same id: the other
+    workers reconnect to it, and its `hello` on the bus resets what they
+    knew of its clients.
+    """
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise SystemExit("--workers > 1 needs SO_REUSEPORT (Linux / macOS)")
+
+    bus_dir = tempfile.mkdtemp(prefix="mycelia-bus-")
+    processes: Dict[int, multiprocessing.Process] = {}
+    stopping = False
+
+    def _start(worker_id: int) -> None:
+        p = multiprocessing.Process(
+            target=run_worker, args=(config_path, worker_id, workers, bus_dir), name=f"worker-{worker_id}"
+        )
+        p.start()
+        processes[worker_id] = p
+
+    def _stop_workers(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for p in processes.values():
+            if p.is_alive():
+                p.terminate()
+
+    try:
+        for i in range(workers):
+            _start(i)
+        signal.signal(signal.SIGTERM, _stop_workers)
+        while processes:
+            multiprocessing.connection.wait([p.sentinel for p in processes.values()])
+            for worker_id, p in list(processes.items()):
+                if p.is_alive():
+                    continue
+                del processes[worker_id]
+                if not stopping and p.exitcode != 0:
+                    print(f"worker-{worker_id} died (exit code {p.exitcode}), restarting")
+                    time.sleep(RESPAWN_DELAY_S)
+                    _start(worker_id)
+    except KeyboardInterrupt:
+        stopping = True
+        for p in processes.values():
+            p.join()
+    finally:
+        for p in processes.values():
+            if p.is_alive():
+                p.terminate()
+        shutil.rmtree(bus_dir, ignore_errors=True)
+
 
 def main() -> None:
-    cfg = load_config("config.json")
-    app = build_app(cfg)
-    web.run_app(app, host=cfg.server.host, port=cfg.server.port)
+    p = argparse.ArgumentParser(description="Mycelia HTTP + WebSocket server")
+    p.add_argument("--config", default="config.json", help="Path to config.json")
+    p.add_argument("--workers", type=int, default=1, help="Number of worker processes sharing the port")
+    args = p.parse_args()
+
+    if args.workers > 1:
+        if load_config(args.config).federation.enabled:
+            raise SystemExit("Federation links one process per server: use --workers 1")
+        run_workers(args.config, args.workers)
+    else:
+        run_worker(args.config)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
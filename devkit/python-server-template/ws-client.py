@@ -21,6 +21,10 @@ Run:
   python ws_client.py --url ws://localhost:8000/ws --send action=led value=true
   python ws_client.py --url ws://localhost:8000/ws --send action=set_temp value=21
 
+Fleet load generator (many simulated devices in one process):
+  python ws_client.py --fleet 2000 --load ping=1 --load 01-wind-toggle=0.2:256 --duration 60
+  python ws_client.py --fleet-profile fleet.json
+
 Interactive commands (type "help"):
   show
   set sender_id=...
@@ -34,8 +38,9 @@ Interactive commands (type "help"):
 import argparse
 import asyncio
 import json
+import random
 import time
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from typing import Any, Dict, Optional, Protocol, runtime_checkable, List
 
 import websockets
@@ -244,6 +249,224 @@ async def interactive_send_loop(ws: WsLike, defaults: Defaults) -> None:
         print("Unknown command. Type 'help'.")
 
 
+# ---------------- Fleet load generator ----------------
+@dataclass
+class ActionLoad:
+    action: str
+    rate: float     # messages per second, per device
+    size: int = 0   # payload bytes (string value), 0 -> null
+
+
+@dataclass
+class FleetProfile:
+    devices: int = 100
+    loads: List[ActionLoad] = field(default_factory=lambda: [ActionLoad("ping", 1.0)])
+    sender_prefix: str = "FLEET"
+    # "on_connect": send 00-new-connection right after connecting, "never": stay anonymous
+    new_connection: str = "on_connect"
+    duration: float = 30.0
+    ramp: float = 200.0              # new connections per second
+    report_interval: float = 5.0
+    query: str = ""                  # extra /ws query string, e.g. "subscribe=01-*"
+
+    @classmethod
+    def from_file(cls, path: str) -> "FleetProfile":
+        """
+        {
+          "devices": 2000,
+          "loads": [{"action": "ping", "rate": 1}, {"action": "01-wind-toggle", "rate": 0.2, "size": 256}],
+          "new_connection": "on_connect",
+          "duration": 60
+        }
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        loads = [ActionLoad(l["action"], float(l["rate"]), int(l.get("size", 0))) for l in raw.pop("loads", [])]
+        profile = cls(**raw)
+        if loads:
+            profile.loads = loads
+        return profile
+
+
+def parse_load(token: str) -> ActionLoad:
+    """
+    action=rate[:size], e.g. "ping=1" or "01-wind-toggle=0.2:256"
+    """
+    action, spec = token.split("=", 1)
+    rate, _, size = spec.partition(":")
+    return ActionLoad(action.strip(), float(rate), int(size or 0))
+
+
+class Reservoir:
+    """
+    Uniform sample of at most `size` values: keeps percentiles cheap at
+    high receive rates.
+    """
+
+    def __init__(self, size: int = 100_000) -> None:
+        self.size = size
+        self.values: List[float] = []
+        self.seen = 0
+
+    def add(self, value: float) -> None:
+        self.seen += 1
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            i = random.randrange(self.seen)
+            if i < self.size:
+                self.values[i] = value
+
+
+class FleetStats:
+    def __init__(self) -> None:
+        self.connected = 0
+        self.connect_failures = 0
+        self.disconnects = 0
+        self.sent = 0
+        self.received = 0
+        self.interval = Reservoir()
+        self.total = Reservoir()
+
+    def add_latency(self, value: float) -> None:
+        self.interval.add(value)
+        self.total.add(value)
+
+    def take_interval(self) -> List[float]:
+        values = self.interval.values
+        self.interval = Reservoir()
+        return values
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    values = sorted(values)
+    last = len(values) - 1
+    return {name: values[min(last, int(q * len(values)))] for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+
+
+def format_ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.1f}ms"
+
+
+async def fleet_receive(ws: Any, stats: FleetStats, prefix: str, stop: asyncio.Event) -> None:
+    try:
+        async for msg in ws:
+            now = time.time()
+            try:
+                obj = json.loads(msg)
+            except ValueError:
+                continue
+            for frame in obj if isinstance(obj, list) else (obj,):
+                stats.received += 1
+                metadata = frame.get("metadata", {}) if isinstance(frame, dict) else {}
+                # Same machine, same clock: latency of frames sent by the fleet
+                if str(metadata.get("senderId", "")).startswith(prefix):
+                    stats.add_latency(now - float(metadata.get("timestamp", now)))
+    except ConnectionClosed:
+        pass
+    if not stop.is_set():
+        stats.disconnects += 1
+
+
+async def run_device(index: int, url: str, profile: FleetProfile, stats: FleetStats, stop: asyncio.Event) -> None:
+    sender_id = f"{profile.sender_prefix}-{index:05d}"
+    try:
+        ws = await websockets.connect(url, ping_interval=None, max_size=2**22, open_timeout=30)
+    except (OSError, InvalidURI, InvalidHandshake, asyncio.TimeoutError):
+        stats.connect_failures += 1
+        return
+
+    stats.connected += 1
+    receiver = asyncio.create_task(fleet_receive(ws, stats, profile.sender_prefix, stop))
+    try:
+        if profile.new_connection == "on_connect":
+            await ws.send(json.dumps(build_frame(sender_id, "00-new-connection", None)))
+            stats.sent += 1
+
+        # Fixed rate per action, random phase so devices do not send in lockstep
+        now = time.monotonic()
+        loads = [l for l in profile.loads if l.rate > 0]
+        schedule = [now + random.uniform(0, 1 / l.rate) for l in loads]
+        values = [("x" * l.size) if l.size else None for l in loads]
+        while loads and not stop.is_set() and not receiver.done():
+            i = min(range(len(loads)), key=schedule.__getitem__)
+            delay = schedule[i] - time.monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(stop.wait(), delay)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+            await ws.send(json.dumps(build_frame(sender_id, loads[i].action, values[i])))
+            stats.sent += 1
+            schedule[i] += 1 / loads[i].rate
+        if not loads:
+            await stop.wait()
+    except ConnectionClosed:
+        pass
+    finally:
+        await ws.close()
+        receiver.cancel()
+        stats.connected -= 1
+
+
+async def run_fleet(url: str, profile: FleetProfile) -> None:
+    """
+    Opens `profile.devices` connections (ramped), sends the configured load
+    for `profile.duration` seconds and reports throughput, delivery latency
+    percentiles and disconnects. Thousands of devices need a raised open
+    file limit (ulimit -n).
+    """
+    if profile.query:
+        url += ("&" if "?" in url else "?") + profile.query
+
+    stats = FleetStats()
+    stop = asyncio.Event()
+    devices: List[asyncio.Task] = []
+    started = time.monotonic()
+
+    async def ramp() -> None:
+        for i in range(profile.devices):
+            devices.append(asyncio.create_task(run_device(i, url, profile, stats, stop)))
+            await asyncio.sleep(1 / profile.ramp)
+
+    async def report() -> None:
+        last = time.monotonic()
+        last_sent = last_received = 0
+        while True:
+            await asyncio.sleep(profile.report_interval)
+            now = time.monotonic()
+            elapsed = now - last
+            p = percentiles(stats.take_interval())
+            print(
+                f"[{now - started:6.1f}s] conns={stats.connected} "
+                f"sent={(stats.sent - last_sent) / elapsed:.0f}/s recv={(stats.received - last_received) / elapsed:.0f}/s "
+                f"latency p50={format_ms(p['p50'])} p95={format_ms(p['p95'])} p99={format_ms(p['p99'])} "
+                f"disconnects={stats.disconnects} failures={stats.connect_failures}"
+            )
+            last, last_sent, last_received = now, stats.sent, stats.received
+
+    print(f"Fleet: {profile.devices} devices -> {url} for {profile.duration:.0f}s")
+    ramp_task = asyncio.create_task(ramp())
+    reporter = asyncio.create_task(report())
+    await asyncio.sleep(profile.duration)
+    stop.set()
+    ramp_task.cancel()
+    reporter.cancel()
+    await asyncio.gather(*devices, return_exceptions=True)
+
+    elapsed = time.monotonic() - started
+    p = percentiles(stats.total.values)
+    print("---- fleet summary ----")
+    print(f"devices:          {len(devices)}/{profile.devices} started, {stats.connect_failures} failed to connect")
+    print(f"sent:             {stats.sent} ({stats.sent / elapsed:.0f}/s)")
+    print(f"received:         {stats.received} ({stats.received / elapsed:.0f}/s)")
+    print(f"latency:          p50={format_ms(p['p50'])} p95={format_ms(p['p95'])} p99={format_ms(p['p99'])}")
+    print(f"disconnects:      {stats.disconnects}")
+
+
 # ---------------- Main run loop with reconnect ----------------
 async def run_client(
     url: str,
@@ -315,8 +538,39 @@ def main() -> None:
     p.add_argument("--ping-interval", type=int, default=20, help="Ping interval (seconds)")
     p.add_argument("--reconnect-min", type=float, default=1.0, help="Min reconnect delay (seconds)")
     p.add_argument("--reconnect-max", type=float, default=20.0, help="Max reconnect delay (seconds)")
+
+    # fleet load generator
+    p.add_argument("--fleet", type=int, default=None, help="Fleet mode: number of simulated devices")
+    p.add_argument("--fleet-profile", default=None, help="Fleet mode from a JSON profile (see FleetProfile)")
+    p.add_argument(
+        "--load",
+        action="append",
+        default=None,
+        help="Per-device load: action=rate[:size] (messages/s, payload bytes). Repeatable",
+    )
+    p.add_argument("--duration", type=float, default=30.0, help="Fleet run duration (seconds)")
+    p.add_argument("--ramp", type=float, default=200.0, help="Fleet connections opened per second")
+    p.add_argument("--new-connection", choices=("on_connect", "never"), default="on_connect",
+                   help="Fleet devices announce themselves with 00-new-connection")
+    p.add_argument("--query", default="", help='Extra fleet /ws query string, e.g. "subscribe=01-*"')
     args = p.parse_args()
 
+    if args.fleet is not None or args.fleet_profile is not None:
+        if args.fleet_profile is not None:
+            profile = FleetProfile.from_file(args.fleet_profile)
+        else:
+            profile = FleetProfile(
+                devices=args.fleet,
+                duration=args.duration,
+                ramp=args.ramp,
+                new_connection=args.new_connection,
+                query=args.query,
+            )
+        if args.load:
+            profile.loads = [parse_load(t) for t in args.load]
+        asyncio.run(run_fleet(args.url, profile))
+        return
+
     defaults = Defaults(sender_id=args.sender_id)
 
     send_once = None